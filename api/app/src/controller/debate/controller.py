@@ -1,12 +1,23 @@
+from typing import Optional
+
 from sqlalchemy import (
-    select,
+    ARRAY,
+    DateTime,
+    Integer,
+    Text,
+    Uuid,
+    any_,
+    bindparam,
+    cast,
     func,
     insert,
+    or_,
+    select,
     update,
-    case,
-    literal,
+    tuple_,
 )
-from sqlalchemy.orm import Session, aliased
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+from sqlalchemy.orm import Session
 
 from ...service.files import FileService
 from models import (
@@ -14,156 +25,433 @@ from models import (
     DebateCategory,
     debate_debate_category_table,
     Vote,
+    VoteChoice,
     DebatesView,
+    DebateSummary,
+    DebateVoteVersion,
     ResponsesView,
 )
-from .model import CreateDebate, UploadFile, GetDebate, GetDebates
+from .model import (
+    CreateDebate,
+    PictureFile,
+    UploadFile,
+    GetDebate,
+    GetDebates,
+    DebatesCursor,
+    GetDebateResponses,
+    ResponseOrder,
+    ResponsesCursor,
+)
+
+# The hot statements are built once per container with bind parameters, so
+# requests skip statement construction and every execution sends the same SQL
+# text, which the driver runs as a server-side prepared statement.
+# Read statements select columns rather than entities, so rows come back as
+# mappings without ORM hydration or the session tracking them.
+
+DEBATE_LIST_COLUMNS = (
+    DebatesView.id,
+    DebatesView.title,
+    DebatesView.category_names,
+    DebatesView.summary,
+    DebatesView.picture_url,
+    DebatesView.response_count,
+    func.to_char(DebatesView.created_at, "MM-DD-YYYY").label("created_at"),
+    DebatesView.created_by,
+    DebatesView.leader,
+    DebatesView.end_at,
+)
+
+
+def _build_debates_statement(is_active: bool, has_cursor: bool):
+    keyset = tuple_(DebatesView.end_at, DebatesView.id)
+    cursor = tuple_(
+        bindparam("cursor_end_at", type_=DateTime(timezone=True)),
+        bindparam("cursor_id", type_=Integer),
+    )
+    if is_active:
+        statement = (
+            select(*DEBATE_LIST_COLUMNS)
+            .filter(DebatesView.end_at > func.now())
+            .order_by(DebatesView.end_at, DebatesView.id)
+        )
+    else:
+        statement = (
+            select(*DEBATE_LIST_COLUMNS)
+            .filter(DebatesView.end_at <= func.now())
+            .order_by(DebatesView.end_at.desc(), DebatesView.id.desc())
+        )
+    if has_cursor:
+        statement = statement.filter(
+            (keyset > cursor) if is_active else (keyset < cursor)
+        )
+    return statement.limit(bindparam("limit", type_=Integer))
+
+
+DEBATES_STATEMENTS = {
+    (is_active, has_cursor): _build_debates_statement(is_active, has_cursor)
+    for is_active in (True, False)
+    for has_cursor in (True, False)
+}
+
+_new_debate = (
+    insert(Debate)
+    .values(
+        title=bindparam("title"),
+        summary=bindparam("summary"),
+        created_by_id=bindparam("created_by_id"),
+        end_at=bindparam("end_at"),
+    )
+    .returning(Debate.id)
+    .cte("new_debate")
+)
+_new_debate_categories = (
+    insert(debate_debate_category_table)
+    .from_select(
+        ["debate_id", "debate_category_id"],
+        select(
+            _new_debate.c.id,
+            func.unnest(bindparam("category_ids", type_=ARRAY(Integer))),
+        ),
+    )
+    .cte("new_debate_categories")
+)
+CREATE_DEBATE_STATEMENT = select(_new_debate.c.id).add_cte(_new_debate_categories)
 
+GET_DEBATE_STATEMENT = select(
+    DebatesView.id,
+    DebatesView.title,
+    DebatesView.category_names,
+    DebatesView.summary,
+    DebatesView.picture_url,
+    DebatesView.end_at,
+    DebatesView.created_by,
+    DebatesView.leader,
+    DebatesView.response_count,
+    func.to_char(DebatesView.created_at, "MM-DD-YYYY").label("created_at"),
+).filter(DebatesView.id == bindparam("debate_id", type_=Integer))
+
+GET_DEBATE_VERSION_STATEMENT = select(DebateSummary.version).filter(
+    DebateSummary.debate_id == bindparam("debate_id", type_=Integer)
+)
 
-def get_debates(session: Session, get_debates: GetDebates) -> list[dict]:
+# Votes bump one of at most 16 shards of the debate's vote version, so the
+# sum changes with every vote without the votes contending for one row
+GET_DEBATE_RESPONSES_VERSION_STATEMENT = select(
+    DebateSummary.version,
+    select(func.coalesce(func.sum(DebateVoteVersion.version), 0))
+    .filter(DebateVoteVersion.debate_id == DebateSummary.debate_id)
+    .scalar_subquery(),
+).filter(DebateSummary.debate_id == bindparam("debate_id", type_=Integer))
+
+
+def _build_debate_responses_statement(order_by: ResponseOrder, has_cursor: bool):
+    statement = select(
+        ResponsesView.id,
+        ResponsesView.body,
+        ResponsesView.created_by,
+        ResponsesView.agree,
+        ResponsesView.disagree,
+    ).filter(ResponsesView.debate_id == bindparam("debate_id", type_=Integer))
+
+    if order_by == ResponseOrder.score:
+        statement = statement.order_by(
+            ResponsesView.vote_difference.desc(), ResponsesView.id.desc()
+        )
+        if has_cursor:
+            statement = statement.filter(
+                tuple_(ResponsesView.vote_difference, ResponsesView.id)
+                < tuple_(
+                    bindparam("cursor_vote_difference", type_=Integer),
+                    bindparam("cursor_id", type_=Integer),
+                )
+            )
+    else:
+        statement = statement.order_by(ResponsesView.id.desc())
+        if has_cursor:
+            statement = statement.filter(
+                ResponsesView.id < bindparam("cursor_id", type_=Integer)
+            )
+    return statement.limit(bindparam("limit", type_=Integer))
+
+
+DEBATE_RESPONSES_STATEMENTS = {
+    (order_by, has_cursor): _build_debate_responses_statement(order_by, has_cursor)
+    for order_by in ResponseOrder
+    for has_cursor in (True, False)
+}
+
+# The category list is serialized by Postgres and read as text, so it goes
+# into the response body without being decoded and encoded again in Python
+GET_CATEGORIES_JSON_STATEMENT = select(
+    cast(
+        func.coalesce(
+            func.jsonb_agg(
+                aggregate_order_by(
+                    func.jsonb_build_object(
+                        "id", DebateCategory.id, "name", DebateCategory.name
+                    ),
+                    DebateCategory.name,
+                )
+            ),
+            cast("[]", JSONB),
+        ),
+        Text,
+    )
+)
+
+USER_VOTES_STATEMENT = select(Vote.response_id, Vote.vote_type).filter(
+    Vote.created_by_id == bindparam("user_id", type_=Uuid),
+    Vote.response_id == any_(bindparam("response_ids", type_=ARRAY(Integer))),
+)
+
+
+def get_debates(session: Session, get_debates: GetDebates) -> dict:
     """
-    Returns list of debates
+    Returns a page of debates, active ones ending soonest first
+    and finished ones most recently finished first
     """
-    active_condition = (
-        (DebatesView.end_at != "Finished")
-        if get_debates.is_active
-        else (DebatesView.end_at == "Finished")
-    )
+    cursor = get_debates.cursor
     debates = (
-        session.query(DebatesView)
-        .filter(active_condition)
-        .order_by(DebatesView.end_at)
+        session.execute(
+            DEBATES_STATEMENTS[(get_debates.is_active, cursor is not None)],
+            {
+                "limit": get_debates.limit + 1,
+                "cursor_end_at": cursor.end_at if cursor else None,
+                "cursor_id": cursor.id if cursor else None,
+            },
+        )
+        .mappings()
         .all()
     )
-    return [debate.to_dict() for debate in debates]
+    next_cursor = None
+    if len(debates) > get_debates.limit:
+        debates = debates[: get_debates.limit]
+        next_cursor = DebatesCursor(
+            end_at=debates[-1]["end_at"], id=debates[-1]["id"]
+        ).encode()
+    return {
+        "debates": [
+            {**debate, "end_at": debate["end_at"].isoformat()} for debate in debates
+        ],
+        "next_cursor": next_cursor,
+    }
 
 
 def create_debate(session: Session, debate: CreateDebate) -> int:
     """
-    Creates a debate
+    Creates a debate and its categories in one statement
     """
-    debate_id = (
-        session.execute(
-            insert(Debate).returning(Debate),
-            debate.bind_vars(),
+    return session.execute(
+        CREATE_DEBATE_STATEMENT,
+        {
+            "title": debate.title,
+            "summary": debate.summary,
+            "created_by_id": debate.created_by_id,
+            "end_at": debate.end_at,
+            "category_ids": debate.category_ids,
+        },
+    ).scalar_one()
+
+
+def update_file_location(
+    picture_file: PictureFile, picture_url: str, session: Session
+) -> Optional[str]:
+    """
+    Updates db to file location unless the debate already shows the same
+    content, which may be its renditions by now. Returns the picture url
+    """
+    update_stmt = (
+        update(Debate)
+        .where(
+            Debate.id == picture_file.debate_id,
+            or_(
+                Debate.picture_url.is_(None),
+                ~Debate.picture_url.contains(picture_file.sha256),
+            ),
         )
-        .first()[0]
-        .id
+        .values(picture_url=picture_url)
     )
-    _create_debate_debate_category_relationship(session, debate_id, debate.category_ids)
-    return debate_id
-
-
-def _create_debate_debate_category_relationship(
-    session: Session, debate_id: id, debate_categories: list[int]
-):
-    session.execute(
-        insert(debate_debate_category_table),
-        [
-            {"debate_id": debate_id, "debate_category_id": category_id}
-            for category_id in debate_categories
-        ],
+    session.execute(update_stmt)
+    return session.scalar(
+        select(Debate.picture_url).filter(Debate.id == picture_file.debate_id)
     )
 
 
-def update_file_location(upload_file: UploadFile, session: Session):
+def upload_file(file_service: FileService, upload_file: UploadFile) -> Optional[dict]:
     """
-    Updates db to file location
+    Uploads file using service, unless the same content is already uploaded
     """
-    condition = Debate.id == upload_file.debate_id
-    update_stmt = (
-        update(Debate).where(condition).values(picture_url=upload_file.file_location)
+    if file_service.get_file_info(upload_file.file_location) is not None:
+        return None
+    return file_service.upload(
+        upload_file.file_bytes,
+        upload_file.file_location,
+        upload_file.content_type.value,
     )
-    session.execute(update_stmt)
 
 
-def upload_file(file_service: FileService, upload_file: UploadFile) -> dict:
+def create_file_upload(
+    file_service: FileService,
+    picture_file: PictureFile,
+    max_size: int,
+    expires_in: int,
+) -> dict:
     """
-    Uploads file using service
+    Creates a presigned POST for the client to upload the file to directly,
+    url and fields are None when the same content is already uploaded
     """
-    return file_service.upload(upload_file.file_bytes, upload_file.file_location)
+    if file_service.get_file_info(picture_file.file_location) is not None:
+        return {"url": None, "fields": None}
+    return file_service.create_upload(
+        picture_file.file_location,
+        picture_file.content_type.value,
+        max_size,
+        expires_in,
+    )
+
+
+def confirm_file_upload(
+    file_service: FileService, session: Session, picture_file: PictureFile
+) -> Optional[str]:
+    """
+    Points the debate's picture at its uploaded file, or at its renditions
+    when they are already written. Returns the picture url or None when no
+    file was uploaded
+    """
+    if file_service.get_file_info(picture_file.file_location) is None:
+        return None
+    upload_url = file_service.get_url(picture_file.file_location)
+    picture_url = update_file_location(picture_file, upload_url, session)
+    # Renditions written before the debate showed the upload are not picked up
+    # by process_debate_picture. Its update waits for this one, so whichever
+    # of the two runs last sees the renditions
+    if picture_url == upload_url and (
+        file_service.get_file_info(picture_file.rendition_location) is not None
+    ):
+        picture_url = file_service.get_url(picture_file.rendition_location)
+        session.execute(
+            update(Debate)
+            .where(Debate.id == picture_file.debate_id)
+            .values(picture_url=picture_url)
+        )
+    return picture_url
 
 
 def get_debate(session: Session, get_debate_model: GetDebate) -> dict:
     """
     Get a debate
     """
-    VoteAgree = aliased(Vote)
-    VoteDisagree = aliased(Vote)
-
-    query = (
-        session.query(
-            DebatesView.id,
-            DebatesView.title,
-            DebatesView.category_names,
-            DebatesView.summary,
-            DebatesView.picture_url,
-            DebatesView.end_at,
-            DebatesView.created_by,
-            DebatesView.leader,
-            DebatesView.response_count,
-            func.to_char(DebatesView.created_at, "MM-DD-YYYY").label("created_at"),
-            case(
-                (func.count(ResponsesView.id) == 0, "[]"),
-                else_=(
-                    func.jsonb_agg(
-                        func.jsonb_build_object(
-                            "id",
-                            ResponsesView.id,
-                            "body",
-                            ResponsesView.body,
-                            "created_by",
-                            ResponsesView.created_by,
-                            "agree",
-                            ResponsesView.agree,
-                            "disagree",
-                            ResponsesView.disagree,
-                            "agree_enabled",
-                            VoteAgree.id.is_(None),
-                            "disagree_enabled",
-                            VoteDisagree.id.is_(None),
-                        )
-                    )
-                ),
-            ).label("responses"),
-        )
-        .outerjoin(ResponsesView, DebatesView.id == ResponsesView.debate_id)
-        .outerjoin(
-            VoteAgree,
-            (ResponsesView.id == VoteAgree.response_id)
-            & (VoteAgree.vote_type == "agree")
-            & (VoteAgree.created_by_id == get_debate_model.user_id),
-        )
-        .outerjoin(
-            VoteDisagree,
-            (ResponsesView.id == VoteDisagree.response_id)
-            & (VoteDisagree.vote_type == "disagree")
-            & (VoteDisagree.created_by_id == get_debate_model.user_id),
-        )
-        .filter(DebatesView.id == get_debate_model.debate_id)
-        .group_by(
-            DebatesView.id,
-            DebatesView.title,
-            DebatesView.category_names,
-            DebatesView.summary,
-            DebatesView.picture_url,
-            DebatesView.end_at,
-            DebatesView.created_at,
-            DebatesView.created_by,
-            DebatesView.leader,
-            DebatesView.response_count,
-        )
-    )
+    result = session.execute(
+        GET_DEBATE_STATEMENT, {"debate_id": get_debate_model.debate_id}
+    ).first()
+    return {**result._asdict(), "end_at": result.end_at.isoformat()} if result else {}
+
+
+def get_debate_version(session: Session, debate_id: int) -> Optional[int]:
+    """
+    Returns the debate's version, which changes with every write
+    to the debate or its responses
+    """
+    return session.scalar(GET_DEBATE_VERSION_STATEMENT, {"debate_id": debate_id})
+
 
-    result = query.first()
-    return result._asdict() if result else {}
+def get_debate_responses_version(session: Session, debate_id: int) -> Optional[str]:
+    """
+    Returns the version of the debate's responses, which changes with every
+    write to the debate, its responses or their votes
+    """
+    result = session.execute(
+        GET_DEBATE_RESPONSES_VERSION_STATEMENT, {"debate_id": debate_id}
+    ).first()
+    return f"{result[0]}.{result[1]}" if result else None
 
 
-def get_categories(session: Session) -> list[str]:
+def get_debate_responses_page(
+    session: Session, get_debate_responses_model: GetDebateResponses
+) -> dict:
     """
-    Returns list of categories
+    Returns a page of responses for a debate, highest score or newest first,
+    without the user's votes so the page is the same for every user
     """
-    debate_categories = (
-        session.query(DebateCategory).order_by(DebateCategory.name).all()
+    cursor = get_debate_responses_model.cursor
+    statement = DEBATE_RESPONSES_STATEMENTS[
+        (get_debate_responses_model.order_by, cursor is not None)
+    ]
+    responses = session.execute(
+        statement,
+        {
+            "debate_id": get_debate_responses_model.debate_id,
+            "limit": get_debate_responses_model.limit + 1,
+            "cursor_vote_difference": cursor.vote_difference if cursor else None,
+            "cursor_id": cursor.id if cursor else None,
+        },
+    ).all()
+    next_cursor = None
+    if len(responses) > get_debate_responses_model.limit:
+        responses = responses[: get_debate_responses_model.limit]
+        last_response = responses[-1]
+        next_cursor = ResponsesCursor(
+            vote_difference=last_response.agree - last_response.disagree,
+            id=last_response.id,
+        ).encode()
+    return {
+        "responses": [response._asdict() for response in responses],
+        "next_cursor": next_cursor,
+    }
+
+
+def add_user_votes(session: Session, page: dict, user_id: str) -> dict:
+    """
+    Returns a copy of the page with whether the user can still
+    agree or disagree with each response
+    """
+    vote_types = dict(
+        session.execute(
+            USER_VOTES_STATEMENT,
+            {
+                "user_id": user_id,
+                "response_ids": [response["id"] for response in page["responses"]],
+            },
+        ).all()
     )
-    return [category.to_dict() for category in debate_categories]
+    return {
+        **page,
+        "responses": [
+            {
+                **response,
+                "agree_enabled": vote_types.get(response["id"]) != VoteChoice.agree,
+                "disagree_enabled": vote_types.get(response["id"])
+                != VoteChoice.disagree,
+            }
+            for response in page["responses"]
+        ],
+    }
+
+
+def get_debate_responses(
+    session: Session, get_debate_responses_model: GetDebateResponses
+) -> dict:
+    """
+    Returns a page of responses for a debate with the user's votes
+    """
+    return add_user_votes(
+        session,
+        get_debate_responses_page(session, get_debate_responses_model),
+        get_debate_responses_model.user_id,
+    )
+
+
+# Serialized category list keyed by DEBATE_CATEGORIES_VERSION
+CATEGORIES_SNAPSHOT = {}
+
+
+def get_categories_body(session: Session, version: int) -> str:
+    """
+    Returns the serialized category list, read from the database once
+    per container and category version
+    """
+    if version not in CATEGORIES_SNAPSHOT:
+        CATEGORIES_SNAPSHOT.clear()
+        CATEGORIES_SNAPSHOT[version] = session.scalar(GET_CATEGORIES_JSON_STATEMENT)
+    return CATEGORIES_SNAPSHOT[version]
@@ -2,13 +2,14 @@
 Pydantic models for debates
 """
 
-from typing import Annotated
+from enum import Enum
+from typing import Annotated, Optional
 from datetime import datetime
 from uuid import UUID
 
-from pydantic import StringConstraints
+from pydantic import Field, StringConstraints
 
-from ..model import PsqlModel, BaseModel
+from ..model import PsqlModel, BaseModel, Cursor
 
 
 class CreateDebate(PsqlModel):
@@ -35,13 +36,64 @@ class CreateDebate(PsqlModel):
     category_ids: list[int]
 
 
-class UploadFile(BaseModel):
+class PictureContentType(Enum):
     """
-    Parameters for uploading a file
+    Image types accepted for debate pictures
+    """
+
+    jpeg = "image/jpeg"
+    png = "image/png"
+    gif = "image/gif"
+    webp = "image/webp"
+
+    @classmethod
+    def detect(cls, file_bytes: bytes) -> "PictureContentType":
+        """
+        Image type of a file from its magic bytes
+        """
+        if file_bytes.startswith(b"\xff\xd8\xff"):
+            return cls.jpeg
+        if file_bytes.startswith(b"\x89PNG\r\n\x1a\n"):
+            return cls.png
+        if file_bytes.startswith((b"GIF87a", b"GIF89a")):
+            return cls.gif
+        if file_bytes.startswith(b"RIFF") and file_bytes[8:12] == b"WEBP":
+            return cls.webp
+        raise ValueError("File must be a jpeg, png, gif or webp image")
+
+
+class PictureFile(BaseModel):
+    """
+    Debate picture stored under the hash of its content
     """
 
     debate_id: int
-    file_location: str
+    sha256: Annotated[str, StringConstraints(pattern=r"^[0-9a-f]{64}$")]
+    content_type: PictureContentType
+
+    @property
+    def file_location(self) -> str:
+        """
+        Key of the picture, it never changes once written
+        """
+        return (
+            f"debates/pictures/{self.debate_id}/{self.sha256}"
+            f".{self.content_type.name}"
+        )
+
+    @property
+    def rendition_location(self) -> str:
+        """
+        Key of the rendition process_debate_picture writes for list pages
+        """
+        return f"debates/renditions/{self.debate_id}/{self.sha256}/320.webp"
+
+
+class UploadFile(PictureFile):
+    """
+    Parameters for uploading a file
+    """
+
     file_bytes: bytes
 
 
@@ -54,9 +106,50 @@ class GetDebate(PsqlModel):
     user_id: UUID
 
 
+class DebatesCursor(Cursor):
+    """
+    Position in the debate list
+    """
+
+    end_at: datetime
+    id: int
+
+
 class GetDebates(PsqlModel):
     """
     Parameters for getting debates
     """
 
     is_active: bool
+    limit: Annotated[int, Field(ge=1, le=100)]
+    cursor: Optional[DebatesCursor] = None
+
+
+class ResponseOrder(Enum):
+    """
+    Orderings for the responses of a debate
+    """
+
+    score = "score"
+    recent = "recent"
+
+
+class ResponsesCursor(Cursor):
+    """
+    Position in the responses of a debate
+    """
+
+    vote_difference: int
+    id: int
+
+
+class GetDebateResponses(PsqlModel):
+    """
+    Parameters for getting the responses of a debate
+    """
+
+    debate_id: int
+    user_id: UUID
+    order_by: ResponseOrder
+    limit: Annotated[int, Field(ge=1, le=100)]
+    cursor: Optional[ResponsesCursor] = None
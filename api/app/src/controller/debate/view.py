@@ -2,7 +2,9 @@
 Routes for debate endpoints
 """
 from base64 import b64decode
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+from os import environ
 
 from aws_lambda_powertools.event_handler.api_gateway import Router
 from aws_lambda_powertools.event_handler.exceptions import BadRequestError
@@ -14,27 +16,80 @@ from .controller import (
     create_debate,
     update_file_location,
     upload_file,
+    create_file_upload,
+    confirm_file_upload,
     get_debate,
-    get_categories,
+    get_debate_version,
+    get_debate_responses_version,
+    get_debate_responses_page,
+    add_user_votes,
+    get_categories_body,
+)
+from ..etag import json_response, make_etag, is_not_modified, not_modified_response
+from ...service.cache import TTLCache
+from table_data import DEBATE_CATEGORIES_VERSION
+from .model import (
+    CreateDebate,
+    PictureContentType,
+    PictureFile,
+    UploadFile,
+    GetDebate,
+    GetDebates,
+    GetDebateResponses,
 )
-from .model import CreateDebate, UploadFile, GetDebate, GetDebates
 
 # pylint: enable=import-error
 
 router = Router()
 
+# Categories only change with DEBATE_CATEGORIES_VERSION, which changes the ETag
+CATEGORIES_CACHE_CONTROL = "public, max-age=86400"
+# Debates are polled, clients revalidate every time against the debate version
+DEBATE_CACHE_CONTROL = "private, no-cache"
+
+# Payloads shared by every user, kept by the warm container. Debates and their
+# response pages are keyed by the debate version, any write invalidates them
+# and they are also shared between containers. The list spans many debates
+# and is only kept for a few seconds
+DEBATE_CACHE = TTLCache(
+    "debate",
+    maxsize=int(environ.get("DEBATE_CACHE_SIZE", "256")),
+    ttl=float(environ.get("DEBATE_CACHE_TTL", "300")),
+    shared=True,
+)
+# Pictures are uploaded straight to S3 with a presigned POST, so they are not
+# bound by the API Gateway payload limit
+MAX_PICTURE_SIZE = int(environ.get("MAX_PICTURE_SIZE", str(20 * 1024 * 1024)))
+PICTURE_UPLOAD_EXPIRES_IN = int(environ.get("PICTURE_UPLOAD_EXPIRES_IN", "300"))
+
+DEBATE_LIST_CACHE = TTLCache(
+    "debate_list",
+    maxsize=int(environ.get("DEBATE_LIST_CACHE_SIZE", "32")),
+    ttl=float(environ.get("DEBATE_LIST_CACHE_TTL", "5")),
+)
+
 
 @router.get("/list")
 def get_debates_route():
     """
-    Returns list of debates
+    Returns a page of debates
     """
     parameters = router.current_event.get("queryStringParameters") or {}
+    get_debates_model = GetDebates(
+        is_active=parameters.get("is_active", True),
+        limit=parameters.get("limit", 20),
+        cursor=parameters.get("cursor"),
+    )
 
-    return get_debates(
-        router.context["db_session"],
-        GetDebates(is_active=parameters.get("is_active", True)),
+    debates = DEBATE_LIST_CACHE.get_or_set(
+        (
+            get_debates_model.is_active,
+            get_debates_model.limit,
+            get_debates_model.cursor.encode() if get_debates_model.cursor else None,
+        ),
+        lambda: get_debates(router.context["db_session"], get_debates_model),
     )
+    return {**debates, "server_time": datetime.now(timezone.utc).isoformat()}
 
 
 @router.post("")
@@ -71,24 +126,69 @@ def put_file_route(debate_id: int):
     """
     if not router.current_event.get("body"):
         raise BadRequestError(msg="Must provide file in body")
-    file_location = f"debates/pictures/{debate_id}"
+    file_bytes = b64decode(router.current_event.body)
     upload_file_model = UploadFile(
         debate_id=debate_id,
-        file_location=file_location,
-        file_bytes=b64decode(router.current_event.body),
+        sha256=sha256(file_bytes).hexdigest(),
+        content_type=PictureContentType.detect(file_bytes),
+        file_bytes=file_bytes,
     )
 
-    response = upload_file(router.context["file_service"], upload_file_model)
-    upload_file_model.file_location = (
-        f"https://{response['bucket_name']}.s3.amazonaws.com/{file_location}"
-    )
-    update_file_location(
+    file_service = router.context["get_file_service"]()
+    upload_file(file_service, upload_file_model)
+    picture_url = update_file_location(
         upload_file_model,
+        file_service.get_url(upload_file_model.file_location),
+        router.context["db_session"],
+    )
+
+    router.context["db_session"].commit()
+    return {"picture_url": picture_url}
+
+
+@router.post("/<debate_id>/file/upload")
+def create_file_upload_route(debate_id: int):
+    """
+    Returns a presigned POST to upload the picture for debate to S3,
+    the picture is stored under the hex SHA-256 of its content
+    """
+    request_body = (
+        router.current_event.json_body if router.current_event.get("body") else {}
+    )
+    return create_file_upload(
+        router.context["get_file_service"](),
+        PictureFile(
+            debate_id=debate_id,
+            sha256=request_body.get("sha256"),
+            content_type=request_body.get("content_type"),
+        ),
+        MAX_PICTURE_SIZE,
+        PICTURE_UPLOAD_EXPIRES_IN,
+    )
+
+
+@router.post("/<debate_id>/file/confirm")
+def confirm_file_upload_route(debate_id: int):
+    """
+    Sets the picture for debate once it is uploaded to S3
+    """
+    request_body = (
+        router.current_event.json_body if router.current_event.get("body") else {}
+    )
+    picture_url = confirm_file_upload(
+        router.context["get_file_service"](),
         router.context["db_session"],
+        PictureFile(
+            debate_id=debate_id,
+            sha256=request_body.get("sha256"),
+            content_type=request_body.get("content_type"),
+        ),
     )
+    if picture_url is None:
+        raise BadRequestError(msg="Picture has not been uploaded")
 
     router.context["db_session"].commit()
-    return {"picture_url": upload_file_model.file_location}
+    return {"picture_url": picture_url}
 
 
 @router.get("/<debate_id>/single")
@@ -97,12 +197,70 @@ def get_debate_route(debate_id: int):
     Returns single debate
     """
     user_id = router.current_event["requestContext"]["authorizer"]["claims"]["sub"]
-    return get_debate(
-        router.context["db_session"],
-        GetDebate(
-            debate_id=debate_id,
-            user_id=user_id,
+    session = router.context["db_session"]
+    get_debate_model = GetDebate(
+        debate_id=debate_id,
+        user_id=user_id,
+    )
+    server_time = datetime.now(timezone.utc).isoformat()
+
+    # Read before the debate so the ETag is never newer than the body
+    version = get_debate_version(session, get_debate_model.debate_id)
+    if version is None:
+        return {"server_time": server_time}
+    etag = make_etag("debate", get_debate_model.debate_id, version)
+    if is_not_modified(router.current_event, etag):
+        return not_modified_response(etag, DEBATE_CACHE_CONTROL)
+
+    debate = DEBATE_CACHE.get_or_set(
+        ("debate", get_debate_model.debate_id, version),
+        lambda: get_debate(session, get_debate_model),
+    )
+    return json_response(
+        {**debate, "server_time": server_time}, etag, DEBATE_CACHE_CONTROL
+    )
+
+
+@router.get("/<debate_id>/responses")
+def get_debate_responses_route(debate_id: int):
+    """
+    Returns a page of responses for a debate
+    """
+    parameters = router.current_event.get("queryStringParameters") or {}
+    user_id = router.current_event["requestContext"]["authorizer"]["claims"]["sub"]
+    session = router.context["db_session"]
+    get_debate_responses_model = GetDebateResponses(
+        debate_id=debate_id,
+        user_id=user_id,
+        order_by=parameters.get("order_by", "score"),
+        limit=parameters.get("limit", 20),
+        cursor=parameters.get("cursor"),
+    )
+
+    # The page carries the user's own votes, so the ETag is per user
+    version = get_debate_responses_version(
+        session, get_debate_responses_model.debate_id
+    )
+    etag = make_etag(
+        "debate-responses", get_debate_responses_model.debate_id, version, user_id
+    )
+    if is_not_modified(router.current_event, etag):
+        return not_modified_response(etag, DEBATE_CACHE_CONTROL)
+
+    cursor = get_debate_responses_model.cursor
+    page = DEBATE_CACHE.get_or_set(
+        (
+            "debate-responses",
+            get_debate_responses_model.debate_id,
+            version,
+            get_debate_responses_model.order_by.value,
+            get_debate_responses_model.limit,
+            cursor.encode() if cursor else None,
         ),
+        lambda: get_debate_responses_page(session, get_debate_responses_model),
+    )
+    return json_response(
+        add_user_votes(session, page, user_id), etag, DEBATE_CACHE_CONTROL
     )
 
 
@@ -111,4 +269,12 @@ def get_categories_route():
     """
     Returns list of debate categories
     """
-    return get_categories(router.context["db_session"])
+    etag = make_etag("debate-categories", DEBATE_CATEGORIES_VERSION)
+    if is_not_modified(router.current_event, etag):
+        return not_modified_response(etag, CATEGORIES_CACHE_CONTROL)
+
+    return json_response(
+        get_categories_body(router.context["db_session"], DEBATE_CATEGORIES_VERSION),
+        etag,
+        CATEGORIES_CACHE_CONTROL,
+    )
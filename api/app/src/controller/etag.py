@@ -0,0 +1,56 @@
+"""
+Conditional responses shared by the cacheable routes
+"""
+from typing import Union
+
+from aws_lambda_powertools.event_handler import Response, content_types
+from aws_lambda_powertools.utilities.data_classes.common import BaseProxyEvent
+
+from .serializer import dumps
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag from the values that identify a representation
+    """
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def is_not_modified(event: BaseProxyEvent, etag: str) -> bool:
+    """
+    Whether the request's If-None-Match already names the ETag
+    """
+    if_none_match = event.get_header_value("If-None-Match")
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    request_etags = {
+        request_etag.strip().removeprefix("W/")
+        for request_etag in if_none_match.split(",")
+    }
+    return "*" in request_etags or etag in request_etags
+
+
+def not_modified_response(etag: str, cache_control: str) -> Response:
+    """
+    304 response without a body
+    """
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": cache_control},
+    )
+
+
+def json_response(
+    body: Union[str, dict, list], etag: str, cache_control: str
+) -> Response:
+    """
+    200 response, a string body is JSON that is already serialized
+    and passes through untouched
+    """
+    return Response(
+        status_code=200,
+        content_type=content_types.APPLICATION_JSON,
+        body=body if isinstance(body, str) else dumps(body),
+        headers={"ETag": etag, "Cache-Control": cache_control},
+    )
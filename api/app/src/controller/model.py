@@ -1,9 +1,10 @@
 """
 Pydantic models common to all features
 """
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from json import loads
 
-from aws_lambda_powertools.utilities.parser import BaseModel
+from pydantic import BaseModel, model_validator
 
 
 class PsqlModel(BaseModel):
@@ -16,3 +17,25 @@ class PsqlModel(BaseModel):
         Bind variables to be used in the query
         """
         return loads(self.json())
+
+
+class Cursor(BaseModel):
+    """
+    Opaque keyset position of the last row of a page
+    """
+
+    def encode(self) -> str:
+        """
+        Encodes the cursor for use in a query string
+        """
+        return urlsafe_b64encode(self.model_dump_json().encode()).decode()
+
+    @model_validator(mode="before")
+    @classmethod
+    def decode(cls, cursor):
+        """
+        Decodes a cursor returned by encode
+        """
+        if isinstance(cursor, str):
+            return loads(urlsafe_b64decode(cursor.encode()))
+        return cursor
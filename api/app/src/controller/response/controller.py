@@ -1,8 +1,36 @@
-from sqlalchemy import delete, func, insert, update
+from sqlalchemy import Integer, Uuid, bindparam, func, insert, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
 
 from models import Response, Vote
-from .model import CreateResponse, CreateVote, DeleteVote, UpdateVote
+from .model import CreateResponse, ToggleVote, ToggleVotes
+
+# Built once per container so every vote sends the same prepared statement
+TOGGLE_VOTE_STATEMENT = select(
+    func.toggle_vote(
+        bindparam("response_id", type_=Integer),
+        bindparam("created_by_id", type_=Uuid),
+        bindparam("vote_type", type_=Vote.vote_type.type),
+    ).table_valued("vote_id", "agree", "disagree", "agree_enabled", "disagree_enabled")
+)
+
+TOGGLE_VOTES_STATEMENT = select(
+    func.toggle_votes(
+        bindparam("created_by_id", type_=Uuid),
+        bindparam("votes", type_=JSONB),
+    ).table_valued(
+        "response_id",
+        "vote_id",
+        "agree",
+        "disagree",
+        "agree_enabled",
+        "disagree_enabled",
+    )
+)
+
+# Raised by toggle_vote and toggle_votes when a response does not exist
+NO_DATA_FOUND = "P0002"
 
 
 def create_response(session: Session, response: CreateResponse) -> int:
@@ -21,56 +49,49 @@ def create_response(session: Session, response: CreateResponse) -> int:
     }
 
 
-def check_if_vote_exists(session: Session, vote_model: CreateVote) -> Vote:
+def toggle_vote(session: Session, vote_model: ToggleVote) -> dict:
     """
-    Determines if a vote exists
+    Creates, updates or deletes the user's vote on a response
+    and returns the response's new vote counts
     """
     return (
-        session.query(Vote)
-        .filter_by(
-            created_by_id=vote_model.created_by_id,
-            response_id=vote_model.response_id,
+        _execute_toggle(
+            session,
+            TOGGLE_VOTE_STATEMENT,
+            {
+                "response_id": vote_model.response_id,
+                "created_by_id": vote_model.created_by_id,
+                "vote_type": vote_model.vote_type,
+            },
         )
-        .first()
+        .one()
+        ._asdict()
     )
 
 
-def create_vote(session: Session, vote_model: CreateVote) -> int:
+def toggle_votes(session: Session, votes_model: ToggleVotes) -> list[dict]:
     """
-    Creates a vote
+    Toggles a batch of the user's votes in one statement
+    and returns the new vote counts of every response
     """
-    return (
-        session.execute(
-            insert(Vote).returning(Vote),
-            vote_model.bind_vars(),
-        )
-        .first()[0]
-        .id
+    rows = _execute_toggle(
+        session,
+        TOGGLE_VOTES_STATEMENT,
+        {
+            "created_by_id": votes_model.created_by_id,
+            "votes": votes_model.model_dump(mode="json")["votes"],
+        },
     )
+    return [row._asdict() for row in rows]
 
 
-def update_vote(session: Session, vote_model: UpdateVote):
+def _execute_toggle(session: Session, statement, parameters: dict):
     """
-    Updates a vote
+    Executes a toggle statement, a missing response raises a ValueError
     """
-    condition = Vote.id == vote_model.vote_id
-    update_stmt = update(Vote).where(condition).values(vote_type=vote_model.vote_type)
-    session.execute(update_stmt)
-
-
-def delete_vote(session: Session, vote_model: DeleteVote):
-    condition = Vote.id == vote_model.vote_id
-    update_stmt = delete(Vote).where(condition)
-    session.execute(update_stmt)
-
-
-def get_response_vote_counts(session: Session, response_id: int) -> dict:
-    vote_counts = (
-        session.query(
-            func.count().filter(Vote.vote_type == "agree").label("agree_count"),
-            func.count().filter(Vote.vote_type == "disagree").label("disagree_count"),
-        )
-        .filter(Vote.response_id == response_id)
-        .first()
-    )
-    return {"agree": vote_counts.agree_count, "disagree": vote_counts.disagree_count}
+    try:
+        return session.execute(statement, parameters)
+    except DBAPIError as error:
+        if getattr(error.orig, "sqlstate", None) != NO_DATA_FOUND:
+            raise
+        raise ValueError(error.orig.diag.message_primary) from error
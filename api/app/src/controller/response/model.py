@@ -1,10 +1,10 @@
 from typing import Annotated
 from uuid import UUID
 
-from pydantic import StringConstraints
+from pydantic import Field, StringConstraints, field_validator
 
 from models import VoteChoice
-from ..model import PsqlModel
+from ..model import PsqlModel, BaseModel
 
 
 class CreateResponse(PsqlModel):
@@ -23,9 +23,9 @@ class CreateResponse(PsqlModel):
     created_by_id: UUID
 
 
-class CreateVote(PsqlModel):
+class ToggleVote(PsqlModel):
     """
-    Parameters for creating a vote
+    Parameters for toggling a vote
     """
 
     response_id: int
@@ -33,18 +33,30 @@ class CreateVote(PsqlModel):
     vote_type: VoteChoice
 
 
-class UpdateVote(PsqlModel):
+class BatchVote(BaseModel):
     """
-    Parameters for updating a vote
+    A single toggle within a batch of votes
     """
 
-    vote_id: int
+    response_id: int
     vote_type: VoteChoice
 
 
-class DeleteVote(PsqlModel):
+class ToggleVotes(BaseModel):
     """
-    Parameters for updating a vote
+    Parameters for toggling a batch of votes
     """
 
-    vote_id: int
+    created_by_id: UUID
+    votes: Annotated[list[BatchVote], Field(min_length=1, max_length=100)]
+
+    @field_validator("votes")
+    @classmethod
+    def check_unique_responses(cls, votes: list[BatchVote]) -> list[BatchVote]:
+        """
+        Each response can only be toggled once per batch
+        """
+        response_ids = [vote.response_id for vote in votes]
+        if len(set(response_ids)) != len(response_ids):
+            raise ValueError("Each response can only be voted on once per batch")
+        return votes
@@ -2,19 +2,12 @@
 Routes for response endpoints
 """
 from aws_lambda_powertools.event_handler.api_gateway import Router
+from aws_lambda_powertools.event_handler.exceptions import BadRequestError
 
 # pylint: disable=import-error
 
-from .controller import (
-    check_if_vote_exists,
-    create_response,
-    create_vote,
-    get_response_vote_counts,
-    update_vote,
-    delete_vote,
-)
-from models import VoteChoice
-from .model import CreateResponse, CreateVote, DeleteVote, UpdateVote
+from .controller import create_response, toggle_vote, toggle_votes
+from .model import CreateResponse, ToggleVote, ToggleVotes
 
 # pylint: enable=import-error
 
@@ -62,35 +55,54 @@ def vote_route(response_id: int):
     session = router.context["db_session"]
     user_id = router.current_event["requestContext"]["authorizer"]["claims"]["sub"]
 
-    vote_type = parameters.get("vote_type")
-    vote = CreateVote(
-        response_id=response_id,
-        created_by_id=user_id,
-        vote_type=vote_type,
+    vote = toggle_vote(
+        session,
+        ToggleVote(
+            response_id=response_id,
+            created_by_id=user_id,
+            vote_type=parameters.get("vote_type"),
+        ),
     )
-    existing_vote = check_if_vote_exists(session, vote)
-    vote_id = None
-    agree_enabled = vote_type != VoteChoice.agree.value
-    disagree_enabled = vote_type != VoteChoice.disagree.value
-    if existing_vote:
-        if existing_vote.vote_type.value == vote_type:
-            delete_vote(session, DeleteVote(vote_id=existing_vote.id))
-            agree_enabled = True
-            disagree_enabled = True
-        else:
-            update_vote(
-                session, UpdateVote(vote_id=existing_vote.id, vote_type=vote_type)
-            )
-        vote_id = existing_vote.id
-    else:
-        vote_id = create_vote(session, vote)
-
-    vote_counts = get_response_vote_counts(session, response_id)
 
     session.commit()
 
     return {
-        "vote_id": vote_id,
-        "agree": {"count": vote_counts["agree"], "enabled": agree_enabled},
-        "disagree": {"count": vote_counts["disagree"], "enabled": disagree_enabled},
+        "vote_id": vote["vote_id"],
+        "agree": {"count": vote["agree"], "enabled": vote["agree_enabled"]},
+        "disagree": {"count": vote["disagree"], "enabled": vote["disagree_enabled"]},
+    }
+
+
+@router.post("/vote/batch")
+def vote_batch_route():
+    """
+    Toggle a batch of votes in one transaction, each vote is
+    created, updated or deleted the same way as a single vote
+    """
+    request_body = (
+        router.current_event.json_body if router.current_event.get("body") else {}
+    )
+    votes = request_body.get("votes") if isinstance(request_body, dict) else None
+    if not isinstance(votes, list):
+        raise BadRequestError(msg="Must provide a list of votes in body")
+    session = router.context["db_session"]
+    user_id = router.current_event["requestContext"]["authorizer"]["claims"]["sub"]
+
+    votes = toggle_votes(session, ToggleVotes(created_by_id=user_id, votes=votes))
+
+    session.commit()
+
+    return {
+        "votes": [
+            {
+                "response_id": vote["response_id"],
+                "vote_id": vote["vote_id"],
+                "agree": {"count": vote["agree"], "enabled": vote["agree_enabled"]},
+                "disagree": {
+                    "count": vote["disagree"],
+                    "enabled": vote["disagree_enabled"],
+                },
+            }
+            for vote in votes
+        ]
     }
@@ -0,0 +1,38 @@
+"""
+JSON serialization of response bodies
+"""
+from decimal import Decimal
+from json import dumps as json_dumps, loads as json_loads
+from typing import Any, Union
+
+from aws_lambda_powertools.shared.json_encoder import Encoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any) -> str:
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> str:
+    """
+    Serializes obj as compact JSON with orjson when it is installed,
+    falling back to the resolver's default encoder
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default).decode()
+    return json_dumps(obj, separators=(",", ":"), cls=Encoder)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Deserializes JSON with orjson when it is installed
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json_loads(data)
@@ -1,30 +1,44 @@
 """
 Entrypoint for the API
 """
+from importlib import import_module
 from os import environ
 
 from aws_lambda_powertools import Logger
 from aws_lambda_powertools.event_handler import APIGatewayRestResolver
 from aws_lambda_powertools.logging import correlation_paths
 from aws_lambda_powertools.utilities.typing import LambdaContext
-from aws_lambda_powertools.utilities.parameters import get_secret
-from boto3 import client
 
 # pylint: disable=import-error
-from src.controller.debate.view import router as debate_router
-from src.controller.response.view import router as response_router
-from src.service.files import FileService
-
-from src.service.database import get_db_session
+from src.controller.serializer import dumps
+from src.service.files import get_file_service
 
 # pylint: enable=import-error
-app = APIGatewayRestResolver()
-app.include_router(debate_router, prefix="/debate")
-app.include_router(response_router, prefix="/response")
+app = APIGatewayRestResolver(serializer=dumps)
+
+# Route modules are imported the first time a request needs them, so a cold
+# start only pays for the controllers, models and database layer it uses
+ROUTE_MODULES = {
+    "/debate": "src.controller.debate.view",
+    "/response": "src.controller.response.view",
+}
+INCLUDED_PREFIXES = set()
 
 LOGGER = Logger(level=environ["LOG_LEVEL"])
-DB_SESSION = get_db_session(get_secret(environ["DB_SECRET_NAME"], transform="json"))
-FILE_SERVICE = FileService(client("s3"), environ["S3_BUCKET"])
+
+
+def include_routes(path: str) -> bool:
+    """
+    Includes the router serving the path if it is not included yet,
+    returns whether the path belongs to one of the route modules
+    """
+    for prefix, module_name in ROUTE_MODULES.items():
+        if path == prefix or path.startswith(f"{prefix}/"):
+            if prefix not in INCLUDED_PREFIXES:
+                app.include_router(import_module(module_name).router, prefix=prefix)
+                INCLUDED_PREFIXES.add(prefix)
+            return True
+    return False
 
 
 @LOGGER.inject_lambda_context(correlation_id_path=correlation_paths.API_GATEWAY_REST)
@@ -35,16 +49,29 @@ def lambda_handler(event: dict, context: LambdaContext) -> dict:
 
     LOGGER.debug(event)
     LOGGER.debug(context)
-    app.append_context(logger=LOGGER, db_session=DB_SESSION, file_service=FILE_SERVICE)
+    if not include_routes(event.get("path") or ""):
+        return app.resolve(event, context)
+
+    # pylint: disable=import-error,import-outside-toplevel
+    from src.service.cache import cache_stats
+    from src.service.database import get_db_session, session_scope
+
+    # pylint: enable=import-error,import-outside-toplevel
+
     try:
-        result = app.resolve(event, context)
-        return result
+        with session_scope(get_db_session(), LOGGER) as db_session:
+            app.append_context(
+                logger=LOGGER, db_session=db_session, get_file_service=get_file_service
+            )
+            return app.resolve(event, context)
     except ValueError as error:
         LOGGER.error(error)
         return {
             "statusCode": 400,
             "body": str(error),
         }
+    finally:
+        LOGGER.info("Cache stats", extra={"cache_stats": cache_stats()})
 
 
 @app.get("/health")
@@ -0,0 +1,101 @@
+"""
+Caches kept by a warm container between invocations
+"""
+from collections import OrderedDict
+from functools import lru_cache
+from os import environ
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+if TYPE_CHECKING:
+    from .shared_cache import RedisCache
+
+CACHES = []
+
+
+@lru_cache(maxsize=None)
+def get_shared_cache() -> Optional["RedisCache"]:
+    """
+    Cache shared between containers, None when SHARED_CACHE_URL is not set
+    """
+    url = environ.get("SHARED_CACHE_URL")
+    if not url:
+        return None
+
+    # pylint: disable-next=import-outside-toplevel
+    from .shared_cache import Redis, RedisCache
+
+    shared_cache = RedisCache(
+        "shared",
+        Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5),
+        ttl=float(environ.get("SHARED_CACHE_TTL", "300")),
+    )
+    CACHES.append(shared_cache)
+    return shared_cache
+
+
+class TTLCache:
+    """
+    Least recently used cache bounded to maxsize entries,
+    each entry expires ttl seconds after it is set. A shared cache
+    reads misses through the cache shared between containers
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, shared: bool = False):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        CACHES.append(self)
+
+    def get_or_set(self, key: tuple, factory: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for the key, calling factory
+        to set it when it is missing or expired
+        """
+        entry = self.__entries.get(key)
+        now = monotonic()
+        if entry is not None and entry[0] > now:
+            self.__entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        shared_cache = get_shared_cache() if self.shared else None
+        if shared_cache:
+            value = shared_cache.get_or_set(
+                ":".join(str(part) for part in (self.name, *key)), factory
+            )
+        else:
+            value = factory()
+        self.__entries[key] = (now + self.ttl, value)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.maxsize:
+            self.__entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """
+        Removes every entry
+        """
+        self.__entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Hits and misses since the container started
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.__entries),
+        }
+
+
+def cache_stats() -> dict:
+    """
+    Stats of every cache in the container
+    """
+    return {cache.name: cache.stats() for cache in CACHES}
@@ -1,15 +1,66 @@
-from utils import create_db_engine, create_db_session
+from contextlib import contextmanager
+from functools import lru_cache
+from time import perf_counter
+from typing import Iterator
+
+from aws_lambda_powertools import Logger
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+
+from utils import create_secret_db_engine
+
+LOGGER = Logger(child=True)
+
+
+@lru_cache(maxsize=None)
+def get_db_engine() -> Engine:
+    """
+    Creates the container's engine on first use
+    """
+    start = perf_counter()
+    # psycopg prepares every statement on first use, the API only issues a
+    # fixed set of statements so each warm connection keeps them all prepared
+    engine = create_secret_db_engine(
+        "postgresql+psycopg", connect_args={"prepare_threshold": 0}
+    )
+    LOGGER.info(
+        "Created database engine",
+        extra={"init_duration_ms": round((perf_counter() - start) * 1000, 2)},
+    )
+    return engine
+
+
+class LazySession(Session):
+    """
+    Session that only creates the engine once a query needs it
+    """
+
+    def get_bind(self, *args, **kwargs) -> Engine:
+        return get_db_engine()
 
 
 # Get SQLAlchemy Session
-def get_db_session(secret):
-    username = secret["username"]
-    password = secret["password"]
-    db_name = secret["dbname"]
-    host = secret["host"]
+@lru_cache(maxsize=None)
+def get_db_session() -> Session:
+    return LazySession()
 
-    db_conn_string = f"postgresql://{username}:{password}@{host}/{db_name}"
 
-    engine = create_db_engine(db_conn_string)
-    session = create_db_session(engine)
-    return session
+@contextmanager
+def session_scope(session: Session, logger: Logger) -> Iterator[Session]:
+    """
+    Scopes the container's session to a single invocation, rolls back
+    when the invocation fails and closes the session when it ends so no
+    transaction or loaded objects leak into the next invocation. Closing
+    returns the connection to the pool, which keeps it for the next one
+    """
+    try:
+        yield session
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        logger.info(
+            "Closing database session",
+            extra={"identity_map_size": len(session.identity_map)},
+        )
+        session.close()
@@ -1,47 +1,48 @@
 """
 Read/write files
 """
-from io import BytesIO
-from mypy_boto3_s3.client import S3Client
+from functools import lru_cache
+from os import environ
+from time import perf_counter
 
+from aws_lambda_powertools import Logger
 
-class FileService:
-    """
-    File service
-    """
+from file_service import FileService
+
+LOGGER = Logger(child=True)
 
-    def __init__(self, file_client: S3Client, bucket_name: str):
-        self.__file_client = file_client
-        self.__bucket_name = bucket_name
 
-    def delete_file(self, file_location: str) -> bool:
-        """
-        Deletes a file
-        """
-        return (
-            self.__file_client.delete_object(
-                Bucket=self.__bucket_name,
-                Key=file_location,
-            )["ResponseMetadata"]["HTTPStatusCode"]
-            == 204
-        )
+@lru_cache(maxsize=None)
+def get_file_service() -> FileService:
+    """
+    Creates the container's S3 file service on first use
+    """
+    # boto3 takes a large share of the cold start, only routes using S3 load it
+    # pylint: disable=import-outside-toplevel
+    from boto3 import client
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config
 
-    def download(self, file_location: str) -> bytes:
-        """
-        Downloads a file as a byte stream
-        """
-        return self.__file_client.get_object(
-            Bucket=self.__bucket_name,
-            Key=file_location,
-        )["Body"].read()
+    # pylint: enable=import-outside-toplevel
 
-    def upload(self, file_bytes: bytes, file_location: str) -> str:
-        """
-        Uploads a file as a byte stream
-        """
-        self.__file_client.upload_fileobj(
-            BytesIO(file_bytes),
-            self.__bucket_name,
-            file_location,
-        )
-        return {"bucket_name": self.__bucket_name, "file_location": file_location}
+    start = perf_counter()
+    max_concurrency = int(environ.get("S3_MAX_CONCURRENCY", "10"))
+    file_service = FileService(
+        # Every transfer thread holds its own connection from the pool
+        client("s3", config=Config(max_pool_connections=max_concurrency)),
+        environ["S3_BUCKET"],
+        TransferConfig(
+            multipart_threshold=int(
+                environ.get("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024))
+            ),
+            multipart_chunksize=int(
+                environ.get("S3_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024))
+            ),
+            max_concurrency=max_concurrency,
+        ),
+    )
+    LOGGER.info(
+        "Created file service",
+        extra={"init_duration_ms": round((perf_counter() - start) * 1000, 2)},
+    )
+    return file_service
@@ -0,0 +1,123 @@
+"""
+Cache shared by every container through a Redis protocol server
+"""
+from time import monotonic, sleep
+from typing import Any, Callable
+from uuid import uuid4
+
+from aws_lambda_powertools import Logger
+from redis import Redis, RedisError
+
+from ..controller.serializer import dumps, loads
+
+LOGGER = Logger(child=True)
+
+# Deletes the lock only while it still holds the caller's token, so a caller
+# whose lock expired cannot release the lock another caller has since taken
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisCache:
+    """
+    Shared cache where only one caller computes a missing value. The
+    others wait for it up to wait seconds instead of all querying the
+    database, then compute it themselves. Any server error falls back
+    to the factory so the cache can never fail a request
+    """
+
+    def __init__(
+        self,
+        name: str,
+        client: Redis,
+        ttl: float,
+        lock_ttl: float = 5,
+        wait: float = 1,
+        poll_interval: float = 0.02,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self.hits = 0
+        self.misses = 0
+        self.__client = client
+
+    def get_or_set(self, key: str, factory: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value for the key, calling factory to set it
+        when it is missing and no other caller is already setting it
+        """
+        lock_key = f"{key}:lock"
+        lock_token = uuid4().hex
+        locked = False
+        try:
+            cached = self.__client.get(key)
+            if cached is None:
+                locked = bool(
+                    self.__client.set(
+                        lock_key, lock_token, nx=True, px=int(self.lock_ttl * 1000)
+                    )
+                )
+                if not locked:
+                    cached = self.__wait_for(key)
+            if cached is not None:
+                self.hits += 1
+                return loads(cached)
+        except RedisError as error:
+            LOGGER.warning("Shared cache unavailable", extra={"error": str(error)})
+
+        self.misses += 1
+        try:
+            value = factory()
+            if locked:
+                locked = False
+                self.__set(key, value, lock_key, lock_token)
+        finally:
+            if locked:
+                self.__release(lock_key, lock_token)
+        return value
+
+    def __set(self, key: str, value: Any, lock_key: str, lock_token: str):
+        """
+        Sets the value and releases the lock in a single round trip
+        """
+        try:
+            self.__client.pipeline().set(
+                key, dumps(value), px=int(self.ttl * 1000)
+            ).eval(RELEASE_LOCK_SCRIPT, 1, lock_key, lock_token).execute()
+        except RedisError as error:
+            LOGGER.warning("Shared cache unavailable", extra={"error": str(error)})
+
+    def __release(self, lock_key: str, lock_token: str):
+        """
+        Releases the lock when the factory failed, so the other callers
+        do not wait for a value that is never set
+        """
+        try:
+            self.__client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, lock_token)
+        except RedisError as error:
+            LOGGER.warning("Shared cache unavailable", extra={"error": str(error)})
+
+    def __wait_for(self, key: str):
+        """
+        Polls for the value another caller is setting
+        """
+        deadline = monotonic() + self.wait
+        while monotonic() < deadline:
+            sleep(self.poll_interval)
+            cached = self.__client.get(key)
+            if cached is not None:
+                return cached
+        return None
+
+    def stats(self) -> dict:
+        """
+        Hits and misses since the container started
+        """
+        return {"hits": self.hits, "misses": self.misses}
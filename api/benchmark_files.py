@@ -0,0 +1,174 @@
+"""
+Benchmark FileService transfers against a local S3 stand-in
+
+Starts moto's S3 server in a separate process, so its copies of the objects
+are not counted, then times uploads, downloads and batched deletes and
+reports the client's peak traced memory for each. Requires moto[server].
+"""
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from os import environ, urandom
+from pathlib import Path
+from tempfile import TemporaryFile
+from time import perf_counter, sleep
+import subprocess
+import sys
+import tracemalloc
+
+ROOT = Path(__file__).resolve().parents[1]
+BUCKET_NAME = "benchmark-bucket"
+MIB = 1024 * 1024
+
+
+@contextmanager
+def _s3_server(port: int):
+    """
+    Runs moto's S3 server until the block exits
+    """
+    server = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _wait_for(s3_client, timeout: float = 10):
+    deadline = perf_counter() + timeout
+    while True:
+        try:
+            s3_client.list_buckets()
+            return
+        except Exception:  # pylint: disable=broad-except
+            if perf_counter() > deadline:
+                raise
+            sleep(0.1)
+
+
+def _measure(label: str, size: int, run, runs: int):
+    """
+    Prints the best time of the runs and the peak memory they traced
+    """
+    durations = []
+    peak = 0
+    for _ in range(runs):
+        tracemalloc.start()
+        start = perf_counter()
+        run()
+        durations.append(perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    best = min(durations)
+    print(
+        f"{label:40s} {best * 1000:7.0f} ms {size / best / MIB:7.0f} MiB/s"
+        f"  peak {peak / MIB:6.1f} MiB"
+    )
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mib", type=int, default=128)
+    parser.add_argument("--delete-keys", type=int, default=2500)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=5057)
+    args = parser.parse_args()
+
+    sys.path[:0] = [str(ROOT / "api" / "app"), str(ROOT / "orm_layer" / "python")]
+    environ.update(
+        {
+            "AWS_DEFAULT_REGION": "us-east-1",
+            "AWS_ACCESS_KEY_ID": "benchmark",
+            "AWS_SECRET_ACCESS_KEY": "benchmark",
+            "LOG_LEVEL": "WARNING",
+            "S3_BUCKET": BUCKET_NAME,
+        }
+    )
+
+    with _s3_server(args.port) as endpoint_url:
+        environ["AWS_ENDPOINT_URL_S3"] = endpoint_url
+        # pylint: disable=import-outside-toplevel,import-error
+        from boto3 import client
+        from boto3.s3.transfer import TransferConfig
+
+        from file_service import FileService
+        from src.service.files import get_file_service
+
+        # pylint: enable=import-outside-toplevel,import-error
+
+        s3_client = client("s3")
+        _wait_for(s3_client)
+        s3_client.create_bucket(Bucket=BUCKET_NAME)
+        file_service = get_file_service()
+        serial_file_service = FileService(
+            s3_client,
+            BUCKET_NAME,
+            TransferConfig(
+                multipart_threshold=8 * MIB,
+                multipart_chunksize=8 * MIB,
+                use_threads=False,
+            ),
+        )
+
+        size = args.size_mib * MIB
+        data = urandom(size)
+        print(f"{args.size_mib} MiB object, best of {args.runs}")
+        _measure(
+            "upload, single put_object",
+            size,
+            lambda: s3_client.put_object(Bucket=BUCKET_NAME, Key="large", Body=data),
+            args.runs,
+        )
+        _measure(
+            "upload, multipart, 1 thread",
+            size,
+            lambda: serial_file_service.upload(data, "large", "application/x-binary"),
+            args.runs,
+        )
+        _measure(
+            "upload, multipart, configured threads",
+            size,
+            lambda: file_service.upload(data, "large", "application/x-binary"),
+            args.runs,
+        )
+        del data
+        _measure(
+            "download, get_object Body.read()",
+            size,
+            lambda: s3_client.get_object(Bucket=BUCKET_NAME, Key="large")[
+                "Body"
+            ].read(),
+            args.runs,
+        )
+        _measure(
+            "download, FileService.stream",
+            size,
+            lambda: sum(len(chunk) for chunk in file_service.stream("large")),
+            args.runs,
+        )
+
+        with TemporaryFile() as file:
+            _measure(
+                "download, stream to a file",
+                size,
+                lambda: file.seek(0) or file.writelines(file_service.stream("large")),
+                args.runs,
+            )
+
+        keys = [f"delete/{index}" for index in range(args.delete_keys)]
+        for key in keys:
+            s3_client.put_object(Bucket=BUCKET_NAME, Key=key, Body=b"0")
+        start = perf_counter()
+        failed = file_service.delete_files(keys)
+        print(
+            f"delete_files, {len(keys)} keys: "
+            f"{(perf_counter() - start) * 1000:.0f} ms, {len(failed)} failed, "
+            f"{len(file_service.list_files('delete/'))} left"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Check the API Lambda's cold start import time
+
+Runs `python -X importtime` on the handler and on the handler together with
+the modules each route prefix loads. Fails when the median import time of
+any of them is above its budget, or when the handler alone imports a module
+that only routes should load.
+"""
+from argparse import ArgumentParser
+from os import environ
+from pathlib import Path
+from statistics import median
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Modules imported on cold start for each kind of request
+TARGETS = {
+    "/health": ["src.handler"],
+    "/debate": [
+        "src.handler",
+        "src.controller.debate.view",
+        "src.service.database",
+    ],
+    "/response": [
+        "src.handler",
+        "src.controller.response.view",
+        "src.service.database",
+    ],
+}
+
+# Packages only the routes that use them may load
+LAZY_PACKAGES = ["boto3", "sqlalchemy", "psycopg", "pydantic", "models", "redis"]
+
+
+def _import_times(modules: list[str]) -> dict[str, int]:
+    """
+    Cumulative import time in microseconds of every module imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=ROOT / "api" / "app",
+        env={
+            **environ,
+            "PYTHONPATH": str(ROOT / "orm_layer" / "python"),
+            "LOG_LEVEL": "INFO",
+            "DB_SECRET_NAME": "import-time-check",
+            "S3_BUCKET": "import-time-check",
+            "AWS_DEFAULT_REGION": "us-east-1",
+        },
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # The name keeps its indentation, two spaces per nesting level
+        times[name[1:].rstrip()] = int(cumulative)
+    return times
+
+
+def check_import_time(budgets_ms: dict[str, float], runs: int, top: int) -> list[str]:
+    """
+    Returns a description of every target that is over its budget
+    """
+    failures = []
+    for target, modules in TARGETS.items():
+        samples = [_import_times(modules) for _ in range(runs)]
+        # Top level imports are the ones without indentation
+        totals = [
+            sum(time for name, time in sample.items() if not name.startswith(" "))
+            for sample in samples
+        ]
+        total_ms = median(totals) / 1000
+        print(f"{target}: {total_ms:.1f} ms (budget {budgets_ms[target]:.0f} ms)")
+        slowest = sorted(samples[-1].items(), key=lambda item: -item[1])[:top]
+        for name, time in slowest:
+            print(f"    {time / 1000:8.1f} ms  {name.strip()}")
+        if total_ms > budgets_ms[target]:
+            failures.append(f"{target} imports take {total_ms:.1f} ms")
+
+        if target == "/health":
+            eager = {name.strip().split(".")[0] for name in samples[-1]}.intersection(
+                LAZY_PACKAGES
+            )
+            failures.extend(
+                f"src.handler imports {package} eagerly" for package in sorted(eager)
+            )
+    return failures
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("--health-budget-ms", type=float, default=250)
+    parser.add_argument("--route-budget-ms", type=float, default=1500)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    budgets = {
+        target: args.health_budget_ms if target == "/health" else args.route_budget_ms
+        for target in TARGETS
+    }
+    import_time_failures = check_import_time(budgets, args.runs, args.top)
+    for failure in import_time_failures:
+        print(f"Import time check failed: {failure}")
+    sys.exit(1 if import_time_failures else 0)
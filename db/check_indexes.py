@@ -0,0 +1,194 @@
+"""
+Check that the API's hot-path queries are served by indexes
+
+Runs the read controllers against the database, captures the SQL they
+issue and EXPLAINs it with sequential scans disabled, so even a small test
+data set shows whether an index can serve each query. Exits non-zero when
+any query still has to scan one of the checked tables without an index
+condition.
+"""
+from os import environ
+from pathlib import Path
+import sys
+
+from aws_lambda_powertools.utilities.parameters import get_secret
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.extend([str(ROOT / "api" / "app"), str(ROOT / "orm_layer" / "python")])
+
+# pylint: disable=import-error,wrong-import-position
+from src.controller.debate.controller import (
+    get_debates,
+    get_debate,
+    get_debate_version,
+    get_debate_responses_version,
+    get_debate_responses,
+)
+from src.controller.debate.model import (
+    GetDebates,
+    GetDebate,
+    GetDebateResponses,
+    DebatesCursor,
+    ResponsesCursor,
+)
+
+# pylint: enable=import-error,wrong-import-position
+
+CHECKED_TABLES = {
+    "debate",
+    "debate_summary",
+    "debate_debate_category_table",
+    "response",
+    "vote",
+}
+
+# Statements run by the triggers and functions, which SQLAlchemy never sees
+TRIGGER_STATEMENTS = [
+    """
+    SELECT r.created_by_id, r.agree_count - r.disagree_count AS vote_difference
+    FROM response AS r
+    WHERE r.debate_id = :debate_id
+    ORDER BY r.agree_count - r.disagree_count DESC, r.id DESC
+    LIMIT 2
+    """,
+    """
+    SELECT DISTINCT dc.name
+    FROM debate_debate_category_table ddct
+    JOIN debate_category dc ON dc.id = ddct.debate_category_id
+    WHERE ddct.debate_id = :debate_id
+    ORDER BY dc.name
+    """,
+    """
+    SELECT ds.debate_id FROM debate_summary AS ds
+    JOIN debate d ON d.id = ds.debate_id
+    WHERE d.created_by_id = :user_id
+    """,
+    """
+    SELECT ds.debate_id FROM debate_summary AS ds
+    JOIN debate d ON d.id = ds.debate_id
+    WHERE d.leader_id = :user_id
+    """,
+    "SELECT v.id FROM vote AS v WHERE v.response_id = :response_id",
+    """
+    SELECT v.id, v.vote_type FROM vote AS v
+    WHERE v.created_by_id = :user_id AND v.response_id = :response_id
+    """,
+    "SELECT r.agree_count FROM response AS r WHERE r.id = :response_id",
+    """
+    SELECT ddct.debate_id FROM debate_debate_category_table AS ddct
+    WHERE ddct.debate_category_id = :debate_category_id
+    """,
+]
+
+
+def _get_connection_url(secret) -> str:
+    username = secret["username"]
+    password = secret["password"]
+    db_name = secret["dbname"]
+    host = secret["host"]
+
+    return f"postgresql://{username}:{password}@{host}/{db_name}"
+
+
+def _unindexed_scans(plan: dict, limited: bool = False) -> list[str]:
+    """
+    Tables read without an index condition, walking an index in order
+    is only accepted below a LIMIT
+    """
+    scans = []
+    limited = limited or plan["Node Type"] == "Limit"
+    if plan.get("Relation Name") in CHECKED_TABLES:
+        if plan["Node Type"] == "Seq Scan" or (
+            plan["Node Type"] in ("Index Scan", "Index Only Scan")
+            and "Index Cond" not in plan
+            and not limited
+        ):
+            scans.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        scans.extend(_unindexed_scans(child, limited))
+    return scans
+
+
+def _capture_controller_statements(session: Session, ids) -> list:
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(session.get_bind(), "before_cursor_execute", capture)
+    for is_active in (True, False):
+        get_debates(session, GetDebates(is_active=is_active, limit=20))
+        get_debates(
+            session,
+            GetDebates(
+                is_active=is_active,
+                limit=20,
+                cursor=DebatesCursor(end_at=ids.end_at, id=ids.debate_id),
+            ),
+        )
+    get_debate_version(session, ids.debate_id)
+    get_debate_responses_version(session, ids.debate_id)
+    get_debate(session, GetDebate(debate_id=ids.debate_id, user_id=ids.user_id))
+    for order_by in ("score", "recent"):
+        get_debate_responses(
+            session,
+            GetDebateResponses(
+                debate_id=ids.debate_id,
+                user_id=ids.user_id,
+                order_by=order_by,
+                limit=20,
+                cursor=ResponsesCursor(vote_difference=0, id=ids.response_id),
+            ),
+        )
+    event.remove(session.get_bind(), "before_cursor_execute", capture)
+    return statements
+
+
+def check_indexes(session: Session) -> list[str]:
+    """
+    Returns a description of every checked query that scans a table
+    without an index
+    """
+    session.execute(text("SET enable_seqscan = off"))
+    ids = session.execute(
+        text(
+            """
+            SELECT d.id AS debate_id, d.end_at, d.created_by_id AS user_id,
+            r.id AS response_id, ddct.debate_category_id
+            FROM debate d
+            JOIN response r ON r.debate_id = d.id
+            JOIN debate_debate_category_table ddct ON ddct.debate_id = d.id
+            LIMIT 1
+            """
+        )
+    ).one()
+
+    failures = []
+    connection = session.connection()
+    for statement, parameters in _capture_controller_statements(session, ids):
+        plan = connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        ).scalar()[0]["Plan"]
+        failures.extend(f"{table}: {statement}" for table in _unindexed_scans(plan))
+    for statement in TRIGGER_STATEMENTS:
+        plan = session.execute(
+            text(f"EXPLAIN (FORMAT JSON) {statement}"), ids._asdict()
+        ).scalar()[0]["Plan"]
+        failures.extend(f"{table}: {statement}" for table in _unindexed_scans(plan))
+    session.rollback()
+    return failures
+
+
+if __name__ == "__main__":
+    engine = create_engine(
+        _get_connection_url(
+            get_secret(environ["DATABASE_SECRET_NAME"], transform="json")
+        )
+    )
+    with Session(engine) as db_session:
+        unindexed_scans = check_indexes(db_session)
+    for failure in unindexed_scans:
+        print(f"Unindexed scan on {failure}")
+    sys.exit(1 if unindexed_scans else 0)
@@ -9,16 +9,42 @@ from alembic_utils.replaceable_entity import register_entities
 
 from db.migrations.views import debates_view, responses_view
 from db.migrations.functions import (
+    refresh_debate_leader_function,
     update_leader_function,
     update_leader_on_vote_creation_trigger,
+    sync_response_vote_counts_function,
+    sync_response_vote_counts_on_vote_change_trigger,
+    sync_debate_summary_debate_function,
+    sync_debate_summary_on_debate_change_trigger,
+    sync_debate_summary_categories_function,
+    sync_debate_summary_on_category_change_trigger,
+    sync_debate_summary_response_count_function,
+    sync_debate_summary_on_response_change_trigger,
+    sync_debate_summary_usernames_function,
+    sync_debate_summary_on_user_change_trigger,
+    toggle_vote_function,
+    toggle_votes_function,
 )
 
 register_entities(
     [
         debates_view,
         responses_view,
+        refresh_debate_leader_function,
         update_leader_function,
         update_leader_on_vote_creation_trigger,
+        sync_response_vote_counts_function,
+        sync_response_vote_counts_on_vote_change_trigger,
+        sync_debate_summary_debate_function,
+        sync_debate_summary_on_debate_change_trigger,
+        sync_debate_summary_categories_function,
+        sync_debate_summary_on_category_change_trigger,
+        sync_debate_summary_response_count_function,
+        sync_debate_summary_on_response_change_trigger,
+        sync_debate_summary_usernames_function,
+        sync_debate_summary_on_user_change_trigger,
+        toggle_vote_function,
+        toggle_votes_function,
     ]
 )
 
@@ -1,37 +1,30 @@
 from alembic_utils.pg_function import PGFunction
 from alembic_utils.pg_trigger import PGTrigger
 
+# Skipped while debateit.defer_leader is on, toggle_votes then refreshes
+# each affected debate once
 update_leader_function_query = """
 RETURNS TRIGGER AS $$
 DECLARE
    incoming_debate_id INT;
    incoming_response_id INT;
 BEGIN
-    IF TG_OP = 'INSERT' THEN
-        incoming_response_id := NEW.response_id;
-    ELSIF TG_OP = 'DELETE' THEN
-        incoming_response_id := OLD.response_id;
+    IF current_setting('debateit.defer_leader', TRUE) = 'on' THEN
+        RETURN NULL;
     END IF;
 
-   SELECT rv.debate_id INTO incoming_debate_id
-   FROM responses_view AS rv
-   WHERE rv.id = incoming_response_id;
+    IF TG_OP = 'DELETE' THEN
+        incoming_response_id := OLD.response_id;
+    ELSE
+        incoming_response_id := NEW.response_id;
+    END IF;
 
-   RAISE NOTICE 'Debug message: Variable value = %', incoming_debate_id;
+   SELECT r.debate_id INTO incoming_debate_id
+   FROM response AS r
+   WHERE r.id = incoming_response_id;
 
-   UPDATE debate AS d
-   SET leader_id = (
-    SELECT
-        CASE 
-            WHEN COUNT(*) > 1 THEN NULL
-            ELSE MAX(rv.created_by_id::varchar)::uuid
-        END
-    FROM responses_view rv
-    WHERE rv.vote_difference = (SELECT MAX(rv.vote_difference) FROM responses_view rv WHERE rv.debate_id = incoming_debate_id)
-    AND rv.debate_id = incoming_debate_id
-   )
-   WHERE d.id = incoming_debate_id;
-   RETURN NEW;
+   PERFORM refresh_debate_leader(incoming_debate_id);
+   RETURN NULL;
 END;
 $$ LANGUAGE plpgsql;
 """
@@ -48,8 +41,441 @@ update_leader_on_vote_creation_trigger = PGTrigger(
     on_entity="public.vote",
     is_constraint=False,
     definition="""
-    AFTER INSERT OR DELETE ON vote
+    AFTER INSERT OR UPDATE OF vote_type OR DELETE ON vote
     FOR EACH ROW
     EXECUTE FUNCTION update_leader_function();
     """,
 )
+
+# Reads the two highest scores of the debate from
+# ix_response_debate_id_vote_difference, a tie at the top means no leader.
+# The debate row is only written (and locked) when the leader changes.
+refresh_debate_leader_function_query = """
+RETURNS VOID AS $$
+DECLARE
+   top_response RECORD;
+   leader_vote_difference INT;
+   new_leader_id UUID;
+BEGIN
+   FOR top_response IN
+    SELECT r.created_by_id, r.agree_count - r.disagree_count AS vote_difference
+    FROM response AS r
+    WHERE r.debate_id = target_debate_id
+    ORDER BY r.agree_count - r.disagree_count DESC, r.id DESC
+    LIMIT 2
+   LOOP
+    IF leader_vote_difference IS NULL THEN
+        leader_vote_difference := top_response.vote_difference;
+        new_leader_id := top_response.created_by_id;
+    ELSIF top_response.vote_difference = leader_vote_difference THEN
+        new_leader_id := NULL;
+    END IF;
+   END LOOP;
+
+   UPDATE debate AS d
+   SET leader_id = new_leader_id
+   WHERE d.id = target_debate_id
+   AND d.leader_id IS DISTINCT FROM new_leader_id;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+refresh_debate_leader_function = PGFunction(
+    schema="public",
+    signature="refresh_debate_leader(target_debate_id INT)",
+    definition=refresh_debate_leader_function_query,
+)
+
+sync_response_vote_counts_function_query = """
+RETURNS TRIGGER AS $$
+DECLARE
+   changed_response_id INT;
+   changed_debate_id INT;
+   agree_delta INT := 0;
+   disagree_delta INT := 0;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        changed_response_id := OLD.response_id;
+        IF OLD.vote_type = 'agree' THEN
+            agree_delta := agree_delta - 1;
+        ELSE
+            disagree_delta := disagree_delta - 1;
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        changed_response_id := NEW.response_id;
+        IF NEW.vote_type = 'agree' THEN
+            agree_delta := agree_delta + 1;
+        ELSE
+            disagree_delta := disagree_delta + 1;
+        END IF;
+    END IF;
+
+   UPDATE response AS r
+   SET agree_count = r.agree_count + agree_delta,
+       disagree_count = r.disagree_count + disagree_delta
+   WHERE r.id = changed_response_id
+   RETURNING r.debate_id INTO changed_debate_id;
+
+   -- Each connection bumps its own shard, so concurrent votes on a debate do
+   -- not wait on one row and a transaction never holds two shards
+   INSERT INTO debate_vote_version AS dvv (debate_id, shard, version)
+   VALUES (changed_debate_id, pg_backend_pid() % 16, 1)
+   ON CONFLICT (debate_id, shard) DO UPDATE SET version = dvv.version + 1;
+   RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+sync_response_vote_counts_function = PGFunction(
+    schema="public",
+    signature="sync_response_vote_counts_function()",
+    definition=sync_response_vote_counts_function_query,
+)
+
+# Row triggers fire in name order, so this sorts before
+# update_leader_on_vote_creation_trigger which reads the counts
+sync_response_vote_counts_on_vote_change_trigger = PGTrigger(
+    schema="public",
+    signature="sync_response_vote_counts_on_vote_change_trigger",
+    on_entity="public.vote",
+    is_constraint=False,
+    definition="""
+    AFTER INSERT OR UPDATE OF vote_type OR DELETE ON vote
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_response_vote_counts_function();
+    """,
+)
+
+sync_debate_summary_debate_function_query = """
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO debate_summary (debate_id, created_by, leader)
+        SELECT NEW.id, ucbi.username, ul.username
+        FROM "user" ucbi
+        LEFT JOIN "user" ul ON ul.id = NEW.leader_id
+        WHERE ucbi.id = NEW.created_by_id;
+    ELSE
+        UPDATE debate_summary AS ds
+        SET leader = (SELECT ul.username FROM "user" ul WHERE ul.id = NEW.leader_id),
+            version = ds.version + 1
+        WHERE ds.debate_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+sync_debate_summary_debate_function = PGFunction(
+    schema="public",
+    signature="sync_debate_summary_debate_function()",
+    definition=sync_debate_summary_debate_function_query,
+)
+
+sync_debate_summary_on_debate_change_trigger = PGTrigger(
+    schema="public",
+    signature="sync_debate_summary_on_debate_change_trigger",
+    on_entity="public.debate",
+    is_constraint=False,
+    definition="""
+    AFTER INSERT OR UPDATE OF leader_id, title, summary, picture_url, end_at ON debate
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_debate_summary_debate_function();
+    """,
+)
+
+sync_debate_summary_categories_function_query = """
+RETURNS TRIGGER AS $$
+DECLARE
+   changed_debate_id INT;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed_debate_id := OLD.debate_id;
+    ELSE
+        changed_debate_id := NEW.debate_id;
+    END IF;
+
+   UPDATE debate_summary AS ds
+   SET category_names = ARRAY(
+    SELECT DISTINCT dc.name
+    FROM debate_debate_category_table ddct
+    JOIN debate_category dc ON dc.id = ddct.debate_category_id
+    WHERE ddct.debate_id = changed_debate_id
+    ORDER BY dc.name
+   ),
+   version = ds.version + 1
+   WHERE ds.debate_id = changed_debate_id;
+   RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+sync_debate_summary_categories_function = PGFunction(
+    schema="public",
+    signature="sync_debate_summary_categories_function()",
+    definition=sync_debate_summary_categories_function_query,
+)
+
+sync_debate_summary_on_category_change_trigger = PGTrigger(
+    schema="public",
+    signature="sync_debate_summary_on_category_change_trigger",
+    on_entity="public.debate_debate_category_table",
+    is_constraint=False,
+    definition="""
+    AFTER INSERT OR DELETE ON debate_debate_category_table
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_debate_summary_categories_function();
+    """,
+)
+
+sync_debate_summary_response_count_function_query = """
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE debate_summary AS ds
+        SET response_count = ds.response_count + 1, version = ds.version + 1
+        WHERE ds.debate_id = NEW.debate_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE debate_summary AS ds
+        SET response_count = ds.response_count - 1, version = ds.version + 1
+        WHERE ds.debate_id = OLD.debate_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+sync_debate_summary_response_count_function = PGFunction(
+    schema="public",
+    signature="sync_debate_summary_response_count_function()",
+    definition=sync_debate_summary_response_count_function_query,
+)
+
+sync_debate_summary_on_response_change_trigger = PGTrigger(
+    schema="public",
+    signature="sync_debate_summary_on_response_change_trigger",
+    on_entity="public.response",
+    is_constraint=False,
+    definition="""
+    AFTER INSERT OR DELETE ON response
+    FOR EACH ROW
+    EXECUTE FUNCTION sync_debate_summary_response_count_function();
+    """,
+)
+
+sync_debate_summary_usernames_function_query = """
+RETURNS TRIGGER AS $$
+BEGIN
+   UPDATE debate_summary AS ds
+   SET created_by = NEW.username, version = ds.version + 1
+   FROM debate d
+   WHERE d.id = ds.debate_id AND d.created_by_id = NEW.id;
+
+   UPDATE debate_summary AS ds
+   SET leader = NEW.username, version = ds.version + 1
+   FROM debate d
+   WHERE d.id = ds.debate_id AND d.leader_id = NEW.id;
+   RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+sync_debate_summary_usernames_function = PGFunction(
+    schema="public",
+    signature="sync_debate_summary_usernames_function()",
+    definition=sync_debate_summary_usernames_function_query,
+)
+
+sync_debate_summary_on_user_change_trigger = PGTrigger(
+    schema="public",
+    signature="sync_debate_summary_on_user_change_trigger",
+    on_entity="public.user",
+    is_constraint=False,
+    definition="""
+    AFTER UPDATE OF username ON "user"
+    FOR EACH ROW
+    WHEN (OLD.username IS DISTINCT FROM NEW.username)
+    EXECUTE FUNCTION sync_debate_summary_usernames_function();
+    """,
+)
+
+# Creates, switches or removes the caller's vote and returns the new counts in
+# one round trip. The response is locked before the vote row, in the same
+# order as toggle_votes, a conflicting insert from a concurrent request
+# retries against the committed row. A missing response raises no_data_found.
+toggle_vote_function_query = """
+RETURNS TABLE (
+    vote_id INT,
+    agree INT,
+    disagree INT,
+    agree_enabled BOOLEAN,
+    disagree_enabled BOOLEAN
+) AS $$
+DECLARE
+   existing_vote RECORD;
+BEGIN
+   agree_enabled := p_vote_type <> 'agree';
+   disagree_enabled := p_vote_type <> 'disagree';
+
+   PERFORM 1
+   FROM response AS r
+   WHERE r.id = p_response_id
+   FOR NO KEY UPDATE;
+   IF NOT FOUND THEN
+    RAISE EXCEPTION 'Response % does not exist', p_response_id
+    USING ERRCODE = 'no_data_found';
+   END IF;
+
+   LOOP
+    SELECT v.id, v.vote_type INTO existing_vote
+    FROM vote AS v
+    WHERE v.created_by_id = p_created_by_id
+    AND v.response_id = p_response_id
+    FOR UPDATE;
+
+    IF FOUND THEN
+        vote_id := existing_vote.id;
+        IF existing_vote.vote_type = p_vote_type THEN
+            DELETE FROM vote AS v WHERE v.id = existing_vote.id;
+            agree_enabled := TRUE;
+            disagree_enabled := TRUE;
+        ELSE
+            UPDATE vote AS v SET vote_type = p_vote_type WHERE v.id = existing_vote.id;
+        END IF;
+        EXIT;
+    END IF;
+
+    INSERT INTO vote (created_by_id, response_id, vote_type)
+    VALUES (p_created_by_id, p_response_id, p_vote_type)
+    ON CONFLICT (created_by_id, response_id) DO NOTHING
+    RETURNING vote.id INTO vote_id;
+    EXIT WHEN vote_id IS NOT NULL;
+   END LOOP;
+
+   SELECT r.agree_count, r.disagree_count INTO agree, disagree
+   FROM response AS r
+   WHERE r.id = p_response_id;
+   RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+toggle_vote_function = PGFunction(
+    schema="public",
+    signature="toggle_vote(p_response_id INT, p_created_by_id UUID, p_vote_type votechoice)",
+    definition=toggle_vote_function_query,
+)
+
+# Applies a batch of toggles for one user with set based statements. The
+# leader trigger is deferred while the votes change and every affected
+# debate is refreshed once afterwards. Returns the user's vote state and the
+# counts of every requested response. Missing responses raise no_data_found.
+toggle_votes_function_query = """
+RETURNS TABLE (
+    response_id INT,
+    vote_id INT,
+    agree INT,
+    disagree INT,
+    agree_enabled BOOLEAN,
+    disagree_enabled BOOLEAN
+) AS $$
+DECLARE
+   requested_response_ids INT[];
+   locked_response_ids INT[];
+   changed_response_ids INT[];
+   changed_vote_ids INT[];
+BEGIN
+   PERFORM set_config('debateit.defer_leader', 'on', TRUE);
+
+   -- Lock the responses in a fixed order so concurrent batches cannot deadlock
+   -- on the counter updates
+   requested_response_ids := ARRAY(
+    SELECT DISTINCT (e->>'response_id')::INT FROM jsonb_array_elements(p_votes) e
+   );
+   locked_response_ids := ARRAY(
+    SELECT r.id
+    FROM response AS r
+    WHERE r.id = ANY(requested_response_ids)
+    ORDER BY r.id
+    FOR NO KEY UPDATE
+   );
+   IF cardinality(locked_response_ids) < cardinality(requested_response_ids) THEN
+    RAISE EXCEPTION 'Responses % do not exist', ARRAY(
+        SELECT unnest(requested_response_ids) EXCEPT SELECT unnest(locked_response_ids)
+    )
+    USING ERRCODE = 'no_data_found';
+   END IF;
+
+   WITH requested AS (
+    SELECT (e->>'response_id')::INT AS response_id,
+    (e->>'vote_type')::votechoice AS vote_type
+    FROM jsonb_array_elements(p_votes) e
+   ),
+   existing AS (
+    SELECT v.id, v.response_id, v.vote_type
+    FROM vote AS v
+    JOIN requested rv ON rv.response_id = v.response_id
+    WHERE v.created_by_id = p_created_by_id
+    FOR UPDATE OF v
+   ),
+   deleted AS (
+    DELETE FROM vote AS v
+    USING existing e
+    JOIN requested rv ON rv.response_id = e.response_id
+    WHERE v.id = e.id AND rv.vote_type = e.vote_type
+    RETURNING v.id, v.response_id
+   ),
+   updated AS (
+    UPDATE vote AS v
+    SET vote_type = rv.vote_type
+    FROM existing e
+    JOIN requested rv ON rv.response_id = e.response_id
+    WHERE v.id = e.id AND rv.vote_type <> e.vote_type
+    RETURNING v.id, v.response_id
+   ),
+   inserted AS (
+    INSERT INTO vote (created_by_id, response_id, vote_type)
+    SELECT p_created_by_id, rv.response_id, rv.vote_type
+    FROM requested rv
+    WHERE NOT EXISTS (SELECT 1 FROM existing e WHERE e.response_id = rv.response_id)
+    ON CONFLICT ON CONSTRAINT vote_created_by_id_response_id_key DO NOTHING
+    RETURNING vote.id, vote.response_id
+   ),
+   changed AS (
+    SELECT * FROM deleted
+    UNION ALL SELECT * FROM updated
+    UNION ALL SELECT * FROM inserted
+   )
+   SELECT array_agg(c.response_id), array_agg(c.id)
+   INTO changed_response_ids, changed_vote_ids
+   FROM changed c;
+
+   PERFORM set_config('debateit.defer_leader', 'off', TRUE);
+
+   PERFORM refresh_debate_leader(affected.debate_id)
+   FROM (
+    SELECT DISTINCT r.debate_id
+    FROM response AS r
+    WHERE r.id = ANY(changed_response_ids)
+    ORDER BY r.debate_id
+   ) affected;
+
+   RETURN QUERY
+   SELECT r.id, COALESCE(c.vote_id, v.id), r.agree_count, r.disagree_count,
+   v.vote_type IS DISTINCT FROM 'agree', v.vote_type IS DISTINCT FROM 'disagree'
+   FROM jsonb_array_elements(p_votes) e
+   JOIN response AS r ON r.id = (e->>'response_id')::INT
+   LEFT JOIN unnest(changed_response_ids, changed_vote_ids) AS c(response_id, vote_id)
+   ON c.response_id = r.id
+   LEFT JOIN vote AS v ON v.created_by_id = p_created_by_id AND v.response_id = r.id;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+toggle_votes_function = PGFunction(
+    schema="public",
+    signature="toggle_votes(p_created_by_id UUID, p_votes JSONB)",
+    definition=toggle_votes_function_query,
+)
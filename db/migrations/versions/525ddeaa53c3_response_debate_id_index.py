@@ -0,0 +1,38 @@
+"""response_debate_id_index
+
+Revision ID: 525ddeaa53c3
+Revises: ab691e706d87
+Create Date: 2026-10-18 16:48:48.318886
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "525ddeaa53c3"
+down_revision: Union[str, None] = "ab691e706d87"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_response_debate_id_id",
+            "response",
+            ["debate_id", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_response_debate_id_id",
+            table_name="response",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,36 @@
+"""debate_end_at_index
+
+Revision ID: ab691e706d87
+Revises: d0903e989f1d
+Create Date: 2026-10-18 16:47:52.597881
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "ab691e706d87"
+down_revision: Union[str, None] = "d0903e989f1d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_debate_end_at_id",
+            "debate",
+            ["end_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_debate_end_at_id", table_name="debate", postgresql_concurrently=True
+        )
@@ -0,0 +1,74 @@
+"""hot_path_indexes
+
+Revision ID: b183c3356184
+Revises: 525ddeaa53c3
+Create Date: 2026-10-18 16:49:32.227647
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b183c3356184"
+down_revision: Union[str, None] = "525ddeaa53c3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_debate_created_by_id",
+            "debate",
+            ["created_by_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_debate_leader_id",
+            "debate",
+            ["leader_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_debate_debate_category_table_debate_category_id",
+            "debate_debate_category_table",
+            ["debate_category_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_vote_response_id",
+            "vote",
+            ["response_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_vote_response_id",
+            table_name="vote",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_debate_debate_category_table_debate_category_id",
+            table_name="debate_debate_category_table",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_debate_leader_id",
+            table_name="debate",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_debate_created_by_id",
+            table_name="debate",
+            postgresql_concurrently=True,
+        )
@@ -4,6 +4,10 @@ from sqlalchemy.orm import Session
 from models import User
 from model import CreateUser
 
+# Users upserted by one statement, a statement can have at most 65535 bind
+# parameters and every user takes two
+USERS_PER_STATEMENT = 500
+
 
 def create_user(session: Session, create_user_model: CreateUser) -> int:
     """
@@ -16,3 +20,25 @@ def create_user(session: Session, create_user_model: CreateUser) -> int:
         set_={col: getattr(stmt.excluded, col) for col in user_attributes},
     )
     session.execute(stmt)
+
+
+def create_users(session: Session, create_user_models: list[CreateUser]) -> int:
+    """
+    Creates or updates users, USERS_PER_STATEMENT at a time in a single
+    statement. When a user is given twice the last one wins, returns the
+    number of users upserted
+    """
+    users = list(
+        {
+            create_user_model.id: create_user_model.bind_vars()
+            for create_user_model in create_user_models
+        }.values()
+    )
+    for start in range(0, len(users), USERS_PER_STATEMENT):
+        stmt = insert(User).values(users[start : start + USERS_PER_STATEMENT])
+        stmt = stmt.on_conflict_do_update(
+            constraint="user_pkey",
+            set_={col: getattr(stmt.excluded, col) for col in users[0]},
+        )
+        session.execute(stmt)
+    return len(users)
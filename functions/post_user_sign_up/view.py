@@ -1,38 +1,104 @@
+from functools import lru_cache
 from os import environ
 
-from aws_lambda_powertools.utilities.parameters import get_secret
+from aws_lambda_powertools import Logger
+from boto3 import client
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
 
-from utils import create_db_engine, create_db_session
-from controller import create_user
+from utils import create_secret_db_engine
+from controller import create_user, create_users
 from model import CreateUser
 
+LOGGER = Logger(level=environ["LOG_LEVEL"])
+# Sign ups are buffered in this queue when it is set, and their users are
+# created in batches by queue_handler
+SIGN_UP_QUEUE_URL = environ.get("SIGN_UP_QUEUE_URL")
+# Client metadata a client confirming a sign up sets to "true" when the
+# user must exist as soon as the sign up is confirmed
+SYNC_SIGN_UP_KEY = "sync_sign_up"
+
 
 def lambda_handler(event, context):
     """
     Perform post user sign up actions
     """
-    db_session = _get_db_session(
-        get_secret(environ["DB_SECRET_NAME"], transform="json")
-    )
-    create_user(
-        db_session,
-        CreateUser(
-            id=event["request"]["userAttributes"]["sub"], username=event["userName"]
-        ),
+    create_user_model = CreateUser(
+        id=event["request"]["userAttributes"]["sub"],
+        username=event["userName"],
     )
-    db_session.commit()
+    client_metadata = event["request"].get("clientMetadata") or {}
+    if SIGN_UP_QUEUE_URL and client_metadata.get(SYNC_SIGN_UP_KEY) != "true":
+        get_sqs_client().send_message(
+            QueueUrl=SIGN_UP_QUEUE_URL, MessageBody=create_user_model.model_dump_json()
+        )
+        return event
+
+    with get_db_session() as db_session:
+        create_user(db_session, create_user_model)
+        db_session.commit()
     return event
 
 
-# Get SQLAlchemy Session
-def _get_db_session(secret):
-    username = secret["username"]
-    password = secret["password"]
-    db_name = secret["dbname"]
-    host = secret["host"]
+@LOGGER.inject_lambda_context
+def queue_handler(event, context):
+    """
+    Creates the users of buffered sign ups. A batch that cannot be created
+    at once is created user by user, the messages of the users that still
+    fail are reported back to the queue to be retried
+    """
+    create_user_models = {}
+    failed_message_ids = []
+    for record in event["Records"]:
+        try:
+            create_user_models[record["messageId"]] = CreateUser.model_validate_json(
+                record["body"]
+            )
+        except ValidationError:
+            failed_message_ids.append(record["messageId"])
+
+    with get_db_session() as db_session:
+        try:
+            create_users(db_session, list(create_user_models.values()))
+        except IntegrityError:
+            db_session.rollback()
+            for message_id, create_user_model in create_user_models.items():
+                try:
+                    create_user(db_session, create_user_model)
+                except IntegrityError:
+                    db_session.rollback()
+                    failed_message_ids.append(message_id)
+        db_session.commit()
+
+    if failed_message_ids:
+        LOGGER.warning(
+            "Failed to create users", extra={"message_ids": failed_message_ids}
+        )
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": message_id} for message_id in failed_message_ids
+        ]
+    }
 
-    db_conn_string = f"postgresql://{username}:{password}@{host}/{db_name}"
 
-    engine = create_db_engine(db_conn_string)
-    session = create_db_session(engine)
-    return session
+@lru_cache(maxsize=None)
+def get_sqs_client():
+    return client("sqs")
+
+
+@lru_cache(maxsize=None)
+def _get_session_factory() -> sessionmaker:
+    """
+    Creates the container's engine on first use, warm invocations reuse its
+    pooled connection. Every write is a single upsert, so it runs in
+    autocommit mode without BEGIN and COMMIT round trips
+    """
+    return sessionmaker(
+        bind=create_secret_db_engine("postgresql", isolation_level="AUTOCOMMIT")
+    )
+
+
+# Get SQLAlchemy Session
+def get_db_session() -> Session:
+    return _get_session_factory()()
@@ -0,0 +1,230 @@
+from hashlib import sha256
+from io import BytesIO
+from multiprocessing import get_context
+from tempfile import TemporaryFile
+from typing import BinaryIO, Optional
+
+from PIL import Image, ImageOps
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from file_service import FileService
+from models import Debate
+from model import PictureUpload
+
+# Renditions are written to debates/renditions/{debate_id}/{sha256}/{width}.{ext}
+# outside the uploads prefix, so writing them does not trigger this function
+# again. Like the uploads they are named by content and never change
+RENDITION_WIDTHS = (320, 640, 1280)
+RENDITION_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpg": ("JPEG", "image/jpeg"),
+}
+# List pages show the smallest rendition, clients pick others by width
+PICTURE_WIDTH = 320
+PICTURE_EXTENSION = "webp"
+# Uploads are hashed while they are streamed to a temporary file, so only a
+# chunk of the upload is held in memory besides the decoded image
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def download_picture(
+    file_service: FileService, picture_upload: PictureUpload, file: BinaryIO
+) -> str:
+    """
+    Streams the upload into the file, returns the sha256 of its content
+    """
+    content_hash = sha256()
+    for chunk in file_service.stream(picture_upload.file_location, DOWNLOAD_CHUNK_SIZE):
+        content_hash.update(chunk)
+        file.write(chunk)
+    file.seek(0)
+    return content_hash.hexdigest()
+
+
+def decode_picture(picture_file: BinaryIO) -> Image.Image:
+    """
+    Decodes the upload once, rotating it by its EXIF orientation and dropping
+    every other metadata but the color profile
+    """
+    image = ImageOps.exif_transpose(Image.open(picture_file))
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+    icc_profile = image.info.get("icc_profile")
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    image.info = {"icc_profile": icc_profile} if icc_profile else {}
+    return image
+
+
+def render(image: Image.Image, width: int, extension: str) -> bytes:
+    """
+    Encodes the image scaled down to the width, images are never scaled up
+    """
+    if image.width > width:
+        image = image.resize(
+            (width, round(image.height * width / image.width)),
+            Image.Resampling.LANCZOS,
+        )
+    if extension == "jpg" and image.mode == "RGBA":
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        background.info = image.info
+        image = background
+    image_format, _ = RENDITION_FORMATS[extension]
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        format=image_format,
+        quality=80,
+        icc_profile=image.info.get("icc_profile"),
+    )
+    return buffer.getvalue()
+
+
+def _render_to_pipe(connection, image: Image.Image, width: int, extension: str):
+    connection.send_bytes(render(image, width, extension))
+    connection.close()
+
+
+def render_all(image: Image.Image) -> dict:
+    """
+    Renders every rendition in its own process. Lambda has no shared memory
+    for multiprocessing pools, so processes report back through pipes, and
+    forking shares the decoded image with them instead of decoding it again
+    """
+    context = get_context("fork")
+    jobs = []
+    for width in RENDITION_WIDTHS:
+        for extension in RENDITION_FORMATS:
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_render_to_pipe, args=(sender, image, width, extension)
+            )
+            process.start()
+            sender.close()
+            jobs.append(((width, extension), receiver, process))
+
+    renditions = {}
+    for rendition, receiver, process in jobs:
+        try:
+            renditions[rendition] = receiver.recv_bytes()
+        except EOFError as error:
+            raise RuntimeError(f"Rendering {rendition} failed") from error
+        finally:
+            receiver.close()
+            process.join()
+    return renditions
+
+
+def rendition_location(picture_upload: PictureUpload, width: int, extension: str):
+    return (
+        f"debates/renditions/{picture_upload.debate_id}/{picture_upload.sha256}/"
+        f"{width}.{extension}"
+    )
+
+
+def get_url(bucket_name: str, file_location: str) -> str:
+    return f"https://{bucket_name}.s3.amazonaws.com/{file_location}"
+
+
+def get_picture_url(picture_upload: PictureUpload) -> str:
+    """
+    Url of the rendition shown on list pages
+    """
+    return get_url(
+        picture_upload.bucket_name,
+        rendition_location(picture_upload, PICTURE_WIDTH, PICTURE_EXTENSION),
+    )
+
+
+def create_renditions(
+    file_service: FileService, picture_upload: PictureUpload
+) -> Optional[str]:
+    """
+    Renders and uploads the renditions of a debate picture, returns the url
+    of the one shown on list pages. An upload whose content does not match
+    the hash in its key, or that is not a picture, is deleted instead and
+    None is returned
+    """
+    with TemporaryFile() as picture_file:
+        content_hash = download_picture(file_service, picture_upload, picture_file)
+        image = None
+        if content_hash == picture_upload.sha256:
+            try:
+                image = decode_picture(picture_file)
+            except (OSError, Image.DecompressionBombError):
+                # UnidentifiedImageError and truncated files are OSErrors
+                pass
+        if image is None:
+            file_service.delete_file(picture_upload.file_location)
+            return None
+
+    renditions = render_all(image)
+    # The rendition shown on list pages is uploaded last, confirming an
+    # upload picks the renditions up once it exists
+    for (width, extension), rendition_bytes in sorted(
+        renditions.items(),
+        key=lambda rendition: rendition[0] == (PICTURE_WIDTH, PICTURE_EXTENSION),
+    ):
+        file_service.upload(
+            rendition_bytes,
+            rendition_location(picture_upload, width, extension),
+            RENDITION_FORMATS[extension][1],
+        )
+    return get_picture_url(picture_upload)
+
+
+def update_picture_url(
+    session: Session, picture_upload: PictureUpload, picture_url: Optional[str]
+) -> bool:
+    """
+    Points the debate's picture at its renditions, or clears it when
+    picture_url is None, if it shows the upload or its renditions already.
+    Returns whether it did
+    """
+    result = session.execute(
+        update(Debate)
+        .where(
+            Debate.id == picture_upload.debate_id,
+            Debate.picture_url.in_(
+                [
+                    get_url(picture_upload.bucket_name, picture_upload.file_location),
+                    get_picture_url(picture_upload),
+                ]
+            ),
+        )
+        .values(picture_url=picture_url)
+    )
+    return result.rowcount > 0
+
+
+def delete_replaced_pictures(
+    file_service: FileService, picture_upload: PictureUpload
+) -> int:
+    """
+    Deletes the debate's uploads that are older than the picture it shows
+    now, newer ones may still be waiting to be confirmed, and every
+    rendition whose upload is gone. Returns the number of files deleted
+    """
+    current = file_service.get_file_info(picture_upload.file_location)["last_modified"]
+    replaced = []
+    kept_hashes = {picture_upload.sha256}
+    for file in file_service.list_files(
+        f"debates/pictures/{picture_upload.debate_id}/"
+    ):
+        upload = PictureUpload(
+            bucket_name=picture_upload.bucket_name,
+            file_location=file["file_location"],
+        )
+        if upload.sha256 in kept_hashes or file["last_modified"] >= current:
+            kept_hashes.add(upload.sha256)
+        else:
+            replaced.append(file["file_location"])
+    for file in file_service.list_files(
+        f"debates/renditions/{picture_upload.debate_id}/"
+    ):
+        # debates/renditions/{debate_id}/{sha256}/{width}.{ext}
+        if file["file_location"].split("/")[3] not in kept_hashes:
+            replaced.append(file["file_location"])
+
+    file_service.delete_files(replaced)
+    return len(replaced)
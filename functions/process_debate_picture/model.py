@@ -0,0 +1,27 @@
+"""
+Model for debate picture processing
+"""
+from aws_lambda_powertools.utilities.parser import BaseModel
+
+
+class PictureUpload(BaseModel):
+    """
+    Picture uploaded for a debate to debates/pictures/{debate_id}/{sha256}.{type}
+    """
+
+    bucket_name: str
+    file_location: str
+
+    @property
+    def debate_id(self) -> int:
+        """
+        Debate the picture belongs to
+        """
+        return int(self.file_location.split("/")[2])
+
+    @property
+    def sha256(self) -> str:
+        """
+        Hex SHA-256 of the picture's content
+        """
+        return self.file_location.rsplit("/", 1)[-1].split(".", 1)[0]
@@ -0,0 +1,72 @@
+from functools import lru_cache
+from os import environ
+from urllib.parse import unquote_plus
+
+from aws_lambda_powertools import Logger
+from boto3 import client
+
+from file_service import FileService
+from utils import create_db_session, create_secret_db_engine
+from controller import create_renditions, update_picture_url, delete_replaced_pictures
+from model import PictureUpload
+
+LOGGER = Logger(level=environ["LOG_LEVEL"])
+
+
+@LOGGER.inject_lambda_context
+def lambda_handler(event, context):
+    """
+    Creates the renditions of every uploaded debate picture, then deletes
+    the pictures it replaced
+    """
+    s3_client = client("s3")
+    with _get_db_session() as db_session:
+        for record in event["Records"]:
+            picture_upload = PictureUpload(
+                bucket_name=record["s3"]["bucket"]["name"],
+                file_location=unquote_plus(record["s3"]["object"]["key"]),
+            )
+            file_service = FileService(s3_client, picture_upload.bucket_name)
+            picture_url = create_renditions(file_service, picture_upload)
+            if picture_url is None:
+                # The debate may already show the upload, the API only checks
+                # that it exists when it is confirmed
+                update_picture_url(db_session, picture_upload, None)
+                db_session.commit()
+                LOGGER.warning(
+                    "Deleted upload that is not a picture matching its hash",
+                    extra={"file_location": picture_upload.file_location},
+                )
+                continue
+            if not update_picture_url(db_session, picture_upload, picture_url):
+                LOGGER.info(
+                    "Debate does not show the picture, keeping its renditions",
+                    extra={"file_location": picture_upload.file_location},
+                )
+                db_session.rollback()
+                continue
+            db_session.commit()
+            LOGGER.info(
+                "Created picture renditions",
+                extra={
+                    "debate_id": picture_upload.debate_id,
+                    "picture_url": picture_url,
+                    "deleted_files": delete_replaced_pictures(
+                        file_service, picture_upload
+                    ),
+                },
+            )
+
+
+@lru_cache(maxsize=None)
+def _get_db_engine():
+    """
+    Creates the container's engine on first use,
+    warm invocations reuse its pooled connection
+    """
+    return create_secret_db_engine("postgresql")
+
+
+# Get SQLAlchemy Session
+def _get_db_session():
+    return create_db_session(_get_db_engine())
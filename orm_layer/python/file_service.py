@@ -0,0 +1,163 @@
+"""
+Read/write files, shared by the API and the functions working on its files
+"""
+from io import BytesIO
+from typing import TYPE_CHECKING, BinaryIO, Iterable, Iterator, Optional, Union
+
+if TYPE_CHECKING:
+    from boto3.s3.transfer import TransferConfig
+    from mypy_boto3_s3.client import S3Client
+
+# Files stored under the hash of their content never change, so clients and
+# CDNs can keep them for good
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# delete_objects takes up to 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+class FileService:
+    """
+    File service
+    """
+
+    def __init__(
+        self,
+        file_client: "S3Client",
+        bucket_name: str,
+        transfer_config: Optional["TransferConfig"] = None,
+    ):
+        self.__file_client = file_client
+        self.__bucket_name = bucket_name
+        self.__transfer_config = transfer_config
+
+    def delete_file(self, file_location: str) -> bool:
+        """
+        Deletes a file
+        """
+        return (
+            self.__file_client.delete_object(
+                Bucket=self.__bucket_name,
+                Key=file_location,
+            )["ResponseMetadata"]["HTTPStatusCode"]
+            == 204
+        )
+
+    def delete_files(self, file_locations: Iterable[str]) -> list[str]:
+        """
+        Deletes files in batches, returns the ones that could not be deleted
+        """
+        file_locations = list(file_locations)
+        failed = []
+        for start in range(0, len(file_locations), DELETE_BATCH_SIZE):
+            response = self.__file_client.delete_objects(
+                Bucket=self.__bucket_name,
+                Delete={
+                    "Objects": [
+                        {"Key": file_location}
+                        for file_location in file_locations[
+                            start : start + DELETE_BATCH_SIZE
+                        ]
+                    ],
+                    "Quiet": True,
+                },
+            )
+            failed.extend(error["Key"] for error in response.get("Errors", []))
+        return failed
+
+    def stream(
+        self, file_location: str, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """
+        Downloads a file in chunks, holding one chunk in memory at a time
+        """
+        body = self.__file_client.get_object(
+            Bucket=self.__bucket_name,
+            Key=file_location,
+        )["Body"]
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def upload(
+        self,
+        file: Union[bytes, BinaryIO],
+        file_location: str,
+        content_type: str,
+        cache_control: str = IMMUTABLE_CACHE_CONTROL,
+    ) -> dict:
+        """
+        Uploads bytes or a file object, large files are
+        uploaded in concurrent multipart chunks
+        """
+        self.__file_client.upload_fileobj(
+            BytesIO(file) if isinstance(file, bytes) else file,
+            self.__bucket_name,
+            file_location,
+            ExtraArgs={"ContentType": content_type, "CacheControl": cache_control},
+            Config=self.__transfer_config,
+        )
+        return {"bucket_name": self.__bucket_name, "file_location": file_location}
+
+    def create_upload(
+        self,
+        file_location: str,
+        content_type: str,
+        max_size: int,
+        expires_in: int,
+        cache_control: str = IMMUTABLE_CACHE_CONTROL,
+    ) -> dict:
+        """
+        Presigned POST for a client to upload a file directly,
+        limited to the content type and to max_size bytes
+        """
+        return self.__file_client.generate_presigned_post(
+            Bucket=self.__bucket_name,
+            Key=file_location,
+            Fields={"Content-Type": content_type, "Cache-Control": cache_control},
+            Conditions=[
+                {"Content-Type": content_type},
+                {"Cache-Control": cache_control},
+                ["content-length-range", 1, max_size],
+            ],
+            ExpiresIn=expires_in,
+        )
+
+    def get_file_info(self, file_location: str) -> Optional[dict]:
+        """
+        Size, content type and last modification of a file,
+        None when it does not exist
+        """
+        try:
+            response = self.__file_client.head_object(
+                Bucket=self.__bucket_name,
+                Key=file_location,
+            )
+        except self.__file_client.exceptions.ClientError as error:
+            if error.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+        return {
+            "content_length": response["ContentLength"],
+            "content_type": response["ContentType"],
+            "last_modified": response["LastModified"],
+        }
+
+    def list_files(self, prefix: str) -> list[dict]:
+        """
+        Key and last modification of every file under the prefix
+        """
+        return [
+            {"file_location": file["Key"], "last_modified": file["LastModified"]}
+            for page in self.__file_client.get_paginator("list_objects_v2").paginate(
+                Bucket=self.__bucket_name, Prefix=prefix
+            )
+            for file in page.get("Contents", [])
+        ]
+
+    def get_url(self, file_location: str) -> str:
+        """
+        Public url of a file
+        """
+        return f"https://{self.__bucket_name}.s3.amazonaws.com/{file_location}"
@@ -11,6 +11,10 @@ from sqlalchemy import (
     Enum,
     UniqueConstraint,
     ARRAY,
+    BigInteger,
+    SmallInteger,
+    Index,
+    text,
 )
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import Mapped
@@ -28,6 +32,7 @@ debate_debate_category_table = Table(
     Base.metadata,
     Column("debate_id", ForeignKey("debate.id"), primary_key=True),
     Column("debate_category_id", ForeignKey("debate_category.id"), primary_key=True),
+    Index("ix_debate_debate_category_table_debate_category_id", "debate_category_id"),
 )
 
 
@@ -52,6 +57,12 @@ class Debate(Base):
     )
     responses: Mapped[list["Response"]] = relationship(back_populates="debate")
 
+    __table_args__ = (
+        Index("ix_debate_end_at_id", "end_at", "id"),
+        Index("ix_debate_created_by_id", "created_by_id"),
+        Index("ix_debate_leader_id", "leader_id"),
+    )
+
     def __repr__(self):
         return f"""
         <Debate(id: {self.id}, title: {self.title}, summary: {self.summary}, created_at: {self.created_at},
@@ -102,15 +113,28 @@ class Response(Base):
     body: Mapped[str] = mapped_column(String)
     debate_id: Mapped[int] = mapped_column(ForeignKey("debate.id"))
     created_by_id: Mapped[UUID] = mapped_column(ForeignKey("user.id"))
+    agree_count: Mapped[int] = mapped_column(Integer, server_default="0")
+    disagree_count: Mapped[int] = mapped_column(Integer, server_default="0")
 
     debate: Mapped["Debate"] = relationship(back_populates="responses")
     user: Mapped["User"] = relationship(back_populates="responses")
     votes: Mapped["Vote"] = relationship(back_populates="response")
 
+    __table_args__ = (
+        Index(
+            "ix_response_debate_id_vote_difference",
+            "debate_id",
+            text("(agree_count - disagree_count) DESC"),
+            text("id DESC"),
+        ),
+        Index("ix_response_debate_id_id", "debate_id", "id"),
+    )
+
     def __repr__(self):
         return f"""
         <Response(id: {self.id}, body: {self.body},
-        debate_id: {self.debate_id}, created_by_id: {self.created_by_id})>
+        debate_id: {self.debate_id}, created_by_id: {self.created_by_id},
+        agree_count: {self.agree_count}, disagree_count: {self.disagree_count})>
         """
 
     def to_dict(self):
@@ -142,6 +166,46 @@ class Vote(Base):
     response: Mapped["Response"] = relationship(back_populates="votes")
     UniqueConstraint(created_by_id, response_id)
 
+    __table_args__ = (Index("ix_vote_response_id", "response_id"),)
+
+
+class DebateSummary(Base):
+    __tablename__ = "debate_summary"
+
+    debate_id: Mapped[int] = mapped_column(ForeignKey("debate.id"), primary_key=True)
+    response_count: Mapped[int] = mapped_column(Integer, server_default="0")
+    category_names: Mapped[list[str]] = mapped_column(
+        ARRAY(String(30)), server_default="{}"
+    )
+    created_by: Mapped[str] = mapped_column(String(30))
+    leader: Mapped[str] = mapped_column(String(30), nullable=True)
+    # Bumped by every write that changes the debate or its responses, votes
+    # bump a DebateVoteVersion shard instead so they do not all lock this row
+    version: Mapped[int] = mapped_column(BigInteger, server_default="0")
+
+    def __repr__(self):
+        return f"""
+        <DebateSummary(debate_id: {self.debate_id}, response_count: {self.response_count},
+        category_names: {self.category_names}, created_by: {self.created_by}, leader: {self.leader},
+        version: {self.version})>
+        """
+
+
+class DebateVoteVersion(Base):
+    __tablename__ = "debate_vote_version"
+
+    # Every vote bumps the shard of the connection that casts it, the sum of
+    # a debate's shards changes with every vote on its responses
+    debate_id: Mapped[int] = mapped_column(ForeignKey("debate.id"), primary_key=True)
+    shard: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, server_default="0")
+
+    def __repr__(self):
+        return f"""
+        <DebateVoteVersion(debate_id: {self.debate_id}, shard: {self.shard},
+        version: {self.version})>
+        """
+
 
 class DebatesView(Base):
     __tablename__ = "debates_view"
@@ -155,7 +219,7 @@ class DebatesView(Base):
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True))
     created_by: Mapped[str] = mapped_column(String)
     leader: Mapped[str] = mapped_column(String)
-    end_at: Mapped[str] = mapped_column(String)
+    end_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True))
 
     def to_dict(self):
         """
@@ -171,7 +235,7 @@ class DebatesView(Base):
             "created_at": self.created_at.strftime("%m-%d-%Y"),
             "created_by": self.created_by,
             "leader": self.leader,
-            "end_at": self.end_at,
+            "end_at": self.end_at.isoformat(),
         }
 
 
@@ -184,6 +248,7 @@ class ResponsesView(Base):
     created_by: Mapped[str] = mapped_column(String)
     agree: Mapped[int] = mapped_column(Integer)
     disagree: Mapped[int] = mapped_column(Integer)
+    vote_difference: Mapped[int] = mapped_column(Integer)
 
     def to_dict(self):
         """
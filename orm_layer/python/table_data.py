@@ -1,3 +1,7 @@
+# Bump whenever DEBATE_CATEGORIES changes, API containers and clients
+# cache the category list until the version changes
+DEBATE_CATEGORIES_VERSION = 1
+
 DEBATE_CATEGORIES = [
     "Economic Policy",
     "Environmental Issues",
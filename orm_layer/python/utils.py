@@ -1,16 +1,30 @@
 """
 Utils to access database
 """
-from sqlalchemy import create_engine
+import logging
+from os import environ
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 
+LOGGER = logging.getLogger(__name__)
+
+# Seconds a fetched secret is reused before it is read again, so a rotated
+# password is picked up by warm containers without a redeploy
+DB_SECRET_MAX_AGE = int(environ.get("DB_SECRET_MAX_AGE", "300"))
+
 Session = None
 
 
-def create_db_engine(db_conn_string, debug_mode=False):
+def create_db_engine(
+    db_conn_string, debug_mode=False, connect_args=None, isolation_level=None
+):
     return create_engine(
         db_conn_string,
         echo=debug_mode,
+        connect_args=connect_args or {},
+        isolation_level=isolation_level,
         pool_size=1,
         max_overflow=0,
         pool_recycle=3600,
@@ -19,6 +33,63 @@ def create_db_engine(db_conn_string, debug_mode=False):
     )
 
 
+def get_db_secret(force_fetch=False):
+    """
+    Returns the secret named by DB_SECRET_NAME, cached for DB_SECRET_MAX_AGE seconds
+    """
+    # Only the Lambda functions read the secret, scripts using the layer
+    # build their own connection string and do not need powertools
+    # pylint: disable-next=import-outside-toplevel
+    from aws_lambda_powertools.utilities.parameters import get_secret
+
+    return get_secret(
+        environ["DB_SECRET_NAME"],
+        transform="json",
+        max_age=DB_SECRET_MAX_AGE,
+        force_fetch=force_fetch,
+    )
+
+
+def _get_connect_params(secret):
+    username = secret["username"]
+    password = secret["password"]
+    db_name = secret["dbname"]
+    host = secret["host"]
+
+    return make_url(
+        f"postgresql://{username}:{password}@{host}/{db_name}"
+    ).translate_connect_args(username="user", database="dbname")
+
+
+def _connect(dialect, conn_rec, cargs, cparams):
+    """
+    Opens each pooled connection with the current secret, the secret is
+    fetched again once when the cached password is rejected
+    """
+    cparams.update(_get_connect_params(get_db_secret()))
+    try:
+        return dialect.connect(*cargs, **cparams)
+    except dialect.loaded_dbapi.OperationalError as error:
+        if "password authentication failed" not in str(error):
+            raise
+        LOGGER.warning("Database password rejected, fetching the secret again")
+        cparams.update(_get_connect_params(get_db_secret(force_fetch=True)))
+        return dialect.connect(*cargs, **cparams)
+
+
+def create_secret_db_engine(drivername, connect_args=None, isolation_level=None):
+    """
+    Creates an engine that opens its connections with the database secret
+    """
+    engine = create_db_engine(
+        f"{drivername}://",
+        connect_args=connect_args,
+        isolation_level=isolation_level,
+    )
+    event.listen(engine, "do_connect", _connect)
+    return engine
+
+
 def create_db_session(engine):
     global Session
     if not Session:
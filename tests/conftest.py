@@ -0,0 +1,18 @@
+"""
+Puts the API, the ORM layer and the sign up function on the path the way
+Lambda does
+"""
+import sys
+from os import environ
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+sys.path[:0] = [
+    str(ROOT / "api" / "app"),
+    str(ROOT / "functions" / "post_user_sign_up"),
+    str(ROOT / "orm_layer" / "python"),
+]
+
+environ.setdefault("LOG_LEVEL", "INFO")
+environ.setdefault("DB_SECRET_NAME", "test")
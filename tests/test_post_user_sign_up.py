@@ -0,0 +1,180 @@
+"""
+Tests for the post user sign up function, they need a migrated database
+given by TEST_DATABASE_URL
+"""
+from os import environ
+from uuid import uuid4
+
+import pytest
+from moto import mock_sqs
+from sqlalchemy import delete, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.event import listen
+
+import controller
+import utils
+import view
+from models import User
+
+TEST_DATABASE_URL = environ.get("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+
+@pytest.fixture(name="secret_fetches")
+def fixture_secret_fetches(monkeypatch):
+    url = make_url(TEST_DATABASE_URL)
+    secret = {
+        "username": url.username,
+        "password": url.password or "",
+        "host": f"{url.host}:{url.port or 5432}",
+        "dbname": url.database,
+    }
+    secret_fetches = []
+
+    def get_db_secret(force_fetch=False):
+        secret_fetches.append(force_fetch)
+        return secret
+
+    monkeypatch.setattr(utils, "get_db_secret", get_db_secret)
+    monkeypatch.setattr(view, "SIGN_UP_QUEUE_URL", None)
+    view._get_session_factory.cache_clear()
+    yield secret_fetches
+    view._get_session_factory.cache_clear()
+
+
+@pytest.fixture(name="sign_up_queue")
+def fixture_sign_up_queue(monkeypatch, secret_fetches):
+    """
+    Sign ups buffered in a stand-in queue, the users they create are
+    deleted afterwards
+    """
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    with mock_sqs():
+        view.get_sqs_client.cache_clear()
+        queue_url = view.get_sqs_client().create_queue(QueueName="sign-up")["QueueUrl"]
+        monkeypatch.setattr(view, "SIGN_UP_QUEUE_URL", queue_url)
+        user_ids = []
+        yield queue_url, user_ids
+        view.get_sqs_client.cache_clear()
+    with view.get_db_session() as session:
+        session.execute(delete(User).where(User.id.in_(user_ids)))
+    view._get_session_factory().kw["bind"].dispose()
+
+
+class _Context:
+    function_name = "post-user-sign-up"
+    memory_limit_in_mb = 128
+    invoked_function_arn = "arn:aws:lambda:us-east-1:0:function:post-user-sign-up"
+    aws_request_id = "test"
+
+
+def _sign_up_event(user_id: str, username: str = None) -> dict:
+    return {
+        "request": {"userAttributes": {"sub": user_id}},
+        "userName": username or f"test-{user_id[:8]}",
+    }
+
+
+def _receive_batch(queue_url: str) -> dict:
+    """
+    Drains the queue into one event, the way the SQS trigger delivers it
+    """
+    records = []
+    while True:
+        messages = (
+            view.get_sqs_client()
+            .receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)
+            .get("Messages", [])
+        )
+        if not messages:
+            return {"Records": records}
+        records.extend(
+            {"messageId": message["MessageId"], "body": message["Body"]}
+            for message in messages
+        )
+
+
+def _usernames(user_ids: list) -> dict:
+    with view.get_db_session() as session:
+        return {
+            str(user_id): username
+            for user_id, username in session.execute(
+                select(User.id, User.username).where(User.id.in_(user_ids))
+            )
+        }
+
+
+def test_warm_invocations_reuse_the_connection(secret_fetches):
+    engine = view._get_session_factory().kw["bind"]
+    connects = []
+    listen(engine, "connect", lambda dbapi_connection, record: connects.append(1))
+    user_id = str(uuid4())
+
+    try:
+        for _ in range(3):
+            view.lambda_handler(_sign_up_event(user_id), None)
+
+        assert len(connects) == 1
+        assert secret_fetches == [False]
+    finally:
+        with view.get_db_session() as session:
+            session.execute(delete(User).where(User.id == user_id))
+        engine.dispose()
+
+
+def test_queued_sign_ups_are_created_in_batches(sign_up_queue):
+    queue_url, user_ids = sign_up_queue
+    user_ids.extend(str(uuid4()) for _ in range(2 * controller.USERS_PER_STATEMENT + 3))
+    for user_id in user_ids:
+        view.lambda_handler(_sign_up_event(user_id), None)
+    # A sign up delivered twice is created once with its last username
+    view.lambda_handler(_sign_up_event(user_ids[0], "test-renamed"), None)
+    inserts = []
+
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT"):
+            inserts.append(1)
+
+    listen(
+        view._get_session_factory().kw["bind"], "before_cursor_execute", count_inserts
+    )
+
+    event = _receive_batch(queue_url)
+    response = view.queue_handler(event, _Context())
+
+    assert len(event["Records"]) == len(user_ids) + 1
+    assert response == {"batchItemFailures": []}
+    assert len(inserts) == 3
+    usernames = _usernames(user_ids)
+    assert usernames.keys() == set(user_ids)
+    assert usernames[user_ids[0]] == "test-renamed"
+
+
+def test_queued_sign_ups_that_fail_are_retried_alone(sign_up_queue):
+    queue_url, user_ids = sign_up_queue
+    user_ids.extend(str(uuid4()) for _ in range(3))
+    for user_id in user_ids[:2]:
+        view.lambda_handler(_sign_up_event(user_id), None)
+    # Another user already has this username
+    view.lambda_handler(_sign_up_event(user_ids[2], f"test-{user_ids[0][:8]}"), None)
+    malformed_message_id = view.get_sqs_client().send_message(
+        QueueUrl=queue_url, MessageBody='{"id": "no username"}'
+    )["MessageId"]
+
+    event = _receive_batch(queue_url)
+    response = view.queue_handler(event, _Context())
+
+    clashing_message_id = next(
+        record["messageId"]
+        for record in event["Records"]
+        if user_ids[2] in record["body"]
+    )
+    assert sorted(
+        failure["itemIdentifier"] for failure in response["batchItemFailures"]
+    ) == sorted([malformed_message_id, clashing_message_id])
+    assert _usernames(user_ids).keys() == set(user_ids[:2])
@@ -0,0 +1,114 @@
+"""
+Tests for the API's shared cache against an in-process Redis stand-in
+"""
+from threading import Barrier, Lock, Thread
+from time import monotonic, sleep
+
+import pytest
+from fakeredis import FakeRedis, FakeServer
+
+from src.service.shared_cache import RedisCache
+
+
+@pytest.fixture(name="server")
+def fixture_server():
+    return FakeServer()
+
+
+def _cache(server: FakeServer, **kwargs) -> RedisCache:
+    """
+    A cache with its own client, like each container has
+    """
+    return RedisCache("test", FakeRedis(server=server), ttl=60, **kwargs)
+
+
+def test_only_one_caller_computes_a_missing_value(server):
+    callers = 8
+    caches = [_cache(server) for _ in range(callers)]
+    barrier = Barrier(callers)
+    calls = []
+    calls_lock = Lock()
+    results = [None] * callers
+
+    def factory():
+        with calls_lock:
+            calls.append(1)
+        sleep(0.2)
+        return {"id": 1}
+
+    def get(index):
+        barrier.wait()
+        results[index] = caches[index].get_or_set("debate:1", factory)
+
+    threads = [Thread(target=get, args=(index,)) for index in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"id": 1}] * callers
+    assert sum(cache.misses for cache in caches) == 1
+    assert sum(cache.hits for cache in caches) == callers - 1
+    assert FakeRedis(server=server).get("debate:1:lock") is None
+
+
+def test_failed_factory_releases_the_lock(server):
+    cache = _cache(server, wait=1)
+
+    def factory():
+        raise ValueError("database unavailable")
+
+    with pytest.raises(ValueError):
+        cache.get_or_set("debate:1", factory)
+
+    assert FakeRedis(server=server).get("debate:1:lock") is None
+    start = monotonic()
+    assert cache.get_or_set("debate:1", lambda: {"id": 1}) == {"id": 1}
+    assert monotonic() - start < cache.wait
+
+
+def test_waiters_compute_the_value_when_the_lock_holder_died(server):
+    cache = _cache(server, lock_ttl=0.2, wait=0.1)
+    FakeRedis(server=server).set("debate:1:lock", "died", px=200)
+
+    start = monotonic()
+    assert cache.get_or_set("debate:1", lambda: {"id": 1}) == {"id": 1}
+    assert monotonic() - start >= cache.wait
+    # Only the lock holder sets the value
+    assert FakeRedis(server=server).get("debate:1") is None
+
+    sleep(0.2)
+    assert cache.get_or_set("debate:1", lambda: {"id": 2}) == {"id": 2}
+    assert cache.get_or_set("debate:1", lambda: {"id": 3}) == {"id": 2}
+    assert cache.stats() == {"hits": 1, "misses": 2}
+
+
+def test_expired_lock_is_not_released_by_its_old_holder(server):
+    cache = _cache(server, lock_ttl=0.1)
+    client = FakeRedis(server=server)
+
+    def factory():
+        sleep(0.15)
+        client.set("debate:1:lock", "next", px=1000)
+        raise ValueError("slow query timed out")
+
+    with pytest.raises(ValueError):
+        cache.get_or_set("debate:1", factory)
+
+    assert client.get("debate:1:lock") == b"next"
+
+
+def test_unreachable_server_falls_back_to_the_factory(server):
+    cache = _cache(server)
+    server.connected = False
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return {"id": 1}
+
+    assert cache.get_or_set("debate:1", factory) == {"id": 1}
+    assert cache.get_or_set("debate:1", factory) == {"id": 1}
+    assert len(calls) == 2
+    assert cache.stats() == {"hits": 0, "misses": 2}